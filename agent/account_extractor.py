@@ -173,7 +173,7 @@ Guidelines:
 
             # Regex found nothing: fall back to LLM only as last resort
             if self.agent:
-                logger.info("Regex found no account info, trying LLM fallback")
+                logger.debug("Regex found no account info, trying LLM fallback")
                 response = self._query_model(message_text, sender_email, sender_sms)
                 account_data = self._extract_json_from_response(response)
 
@@ -199,8 +199,8 @@ Guidelines:
     ) -> str:
         """Query the LLM model for account extraction"""
         try:
-            from google.genai import Client
-            client = Client()
+            from agent.llm_client import get_genai_client
+            client = get_genai_client()
             
             # Prepare context with all available information
             context = f"Message: {message_text}"
@@ -88,7 +88,8 @@ class EmailProcessingCoordinator:
         Returns:
             EmailProcessingResult with transaction and processing status
         """
-        logger.info(f"Processing email {message_id}")
+        # Per-message logs stay at DEBUG: syncs run thousands of these per task
+        logger.debug("Processing email %s", message_id)
 
         try:
             transaction = self.transaction_extractor.parse_email(
@@ -96,20 +97,21 @@ class EmailProcessingCoordinator:
             )
 
             if transaction:
-                logger.info(
-                    f"Extracted transaction: {transaction.amount} {transaction.transaction_type}"
+                logger.debug(
+                    "Extracted transaction: %s %s", transaction.amount, transaction.transaction_type
                 )
                 if transaction.bank_name or transaction.account_last_four:
-                    logger.info(
-                        f"Account info: {transaction.bank_name or 'Unknown'} "
-                        f"- {transaction.account_last_four or 'N/A'}"
+                    logger.debug(
+                        "Account info: %s - %s",
+                        transaction.bank_name or 'Unknown',
+                        transaction.account_last_four or 'N/A',
                     )
                 return EmailProcessingResult(
                     transaction=transaction,
                     processed=True,
                 )
             else:
-                logger.info(f"Skipped email {message_id}: not a transaction or extraction returned None")
+                logger.debug("Skipped email %s: not a transaction or extraction returned None", message_id)
                 return EmailProcessingResult(
                     transaction=None,
                     processed=False,
@@ -158,7 +160,7 @@ class SmsProcessingCoordinator:
         Returns:
             SmsProcessingResult with transaction and processing status
         """
-        logger.info(f"Processing SMS {sms_id}")
+        logger.debug("Processing SMS %s", sms_id)
 
         try:
             transaction = self.sms_extractor.parse_sms(
@@ -169,20 +171,21 @@ class SmsProcessingCoordinator:
             )
 
             if transaction:
-                logger.info(
-                    f"Extracted transaction: {transaction.amount} {transaction.transaction_type}"
+                logger.debug(
+                    "Extracted transaction: %s %s", transaction.amount, transaction.transaction_type
                 )
                 if transaction.bank_name or transaction.account_last_four:
-                    logger.info(
-                        f"Account info: {transaction.bank_name or 'Unknown'} "
-                        f"- {transaction.account_last_four or 'N/A'}"
+                    logger.debug(
+                        "Account info: %s - %s",
+                        transaction.bank_name or 'Unknown',
+                        transaction.account_last_four or 'N/A',
                     )
                 return SmsProcessingResult(
                     transaction=transaction,
                     processed=True,
                 )
             else:
-                logger.info(f"Skipped SMS {sms_id}: not a transaction or extraction returned None")
+                logger.debug("Skipped SMS %s: not a transaction or extraction returned None", sms_id)
                 return SmsProcessingResult(
                     transaction=None,
                     processed=False,
@@ -109,8 +109,8 @@ Body:
         
         try:
             # Query the agent for intent classification using Google Generative AI
-            from google.genai import Client
-            client = Client()
+            from agent.llm_client import get_genai_client
+            client = get_genai_client()
             
             prompt = f"""{self._get_system_instruction()}
 
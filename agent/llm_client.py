@@ -0,0 +1,41 @@
+"""
+Shared Gemini client for the extraction agents.
+Rate limits and transient server errors are retried with exponential backoff and jitter.
+"""
+
+import threading
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = [408, 429, 500, 502, 503, 504]
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_genai_client():
+    """
+    Return the process-wide google.genai Client, creating it on first use.
+
+    Agents call the model from several worker threads at once; one client
+    shares its HTTP connection pool between them instead of every call
+    building its own.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google.genai import Client, types
+
+                _client = Client(
+                    http_options=types.HttpOptions(
+                        retry_options=types.HttpRetryOptions(
+                            attempts=5,
+                            initial_delay=1.0,
+                            max_delay=60.0,
+                            exp_base=2,
+                            jitter=1,
+                            http_status_codes=RETRYABLE_STATUS_CODES,
+                        )
+                    )
+                )
+    return _client
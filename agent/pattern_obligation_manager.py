@@ -89,7 +89,7 @@ class PatternObligationManager:
         """
         Step 10: Create initial pattern state after discovery.
         """
-        logger.debug(f"[OBLIGATION_MGR] Step 10: Creating initial state for pattern {pattern_id}")
+        logger.debug("[OBLIGATION_MGR] Step 10: Creating initial state for pattern %s", pattern_id)
         
         # Compute first next expected date
         next_expected = PatternObligationManager._compute_next_expected_date(
@@ -98,8 +98,8 @@ class PatternObligationManager:
             last_actual_date=last_transaction_date
         )
         
-        logger.info(f"[OBLIGATION_MGR] Initial state: next_expected={next_expected.date()}, "
-                   f"case={pattern_case.value}, interval={interval_days}d")
+        logger.info("[OBLIGATION_MGR] Initial state: next_expected=%s, case=%s, interval=%sd",
+                    next_expected.date(), pattern_case.value, interval_days)
         
         return PatternState(
             pattern_id=pattern_id,
@@ -126,7 +126,7 @@ class PatternObligationManager:
         Step 11: Compute next expected date based on pattern case.
         CRITICAL: This is deterministic and state-based.
         """
-        logger.debug(f"[OBLIGATION_MGR] Step 11: Computing next expected date, case={pattern_case.value}, interval={interval_days}d")
+        logger.debug("[OBLIGATION_MGR] Step 11: Computing next expected date, case=%s, interval=%sd", pattern_case.value, interval_days)
         if pattern_case == PatternCase.FLEXIBLE_MONTHLY:
             # Next calendar month start — preserve tzinfo from last_actual_date
             tz = last_actual_date.tzinfo
@@ -176,7 +176,7 @@ class PatternObligationManager:
         else:
             tolerance = 3.0  # Default
         
-        logger.debug(f"[OBLIGATION_MGR] Step 12: Tolerance window for {pattern_case.value}: ±{tolerance} days")
+        logger.debug("[OBLIGATION_MGR] Step 12: Tolerance window for %s: ±%s days", pattern_case.value, tolerance)
         return tolerance
     
     # ===== STEP 13: Obligation matching (when new transaction arrives) =====
@@ -196,13 +196,13 @@ class PatternObligationManager:
         """
         days_diff = (expected_date - transaction_date).days
         
-        logger.debug(f"[OBLIGATION_MGR] Step 13: Checking obligation match, days_diff={days_diff}, tolerance=±{tolerance_days}")
+        logger.debug("[OBLIGATION_MGR] Step 13: Checking obligation match, days_diff=%s, tolerance=±%s", days_diff, tolerance_days)
         
         if abs(days_diff) <= tolerance_days:
-            logger.debug(f"[OBLIGATION_MGR] Transaction matches obligation (days_early={days_diff})")
+            logger.debug("[OBLIGATION_MGR] Transaction matches obligation (days_early=%s)", days_diff)
             return (True, days_diff)
         else:
-            logger.debug(f"[OBLIGATION_MGR] Transaction does not match obligation (outside tolerance)")
+            logger.debug("[OBLIGATION_MGR] Transaction does not match obligation (outside tolerance)")
             return (False, days_diff)
     
     # ===== STEP 14: Advance obligation state (safe) =====
@@ -251,23 +251,23 @@ class PatternObligationManager:
         Called when: current_date > next_expected_date + tolerance
         """
         state.missed_count += 1
-        logger.warning(f"[OBLIGATION_MGR] Step 15: Missed obligation detected, missed_count={state.missed_count}")
+        logger.warning("[OBLIGATION_MGR] Step 15: Missed obligation detected, missed_count=%s", state.missed_count)
         
         # Decay confidence
         old_confidence = state.confidence_multiplier
         state.confidence_multiplier = max(0.0, state.confidence_multiplier - PatternObligationManager.CONFIDENCE_DECAY_PER_MISS)
-        logger.debug(f"[OBLIGATION_MGR] Confidence decay: {old_confidence:.2f} -> {state.confidence_multiplier:.2f}")
+        logger.debug("[OBLIGATION_MGR] Confidence decay: %.2f -> %.2f", old_confidence, state.confidence_multiplier)
         
         # State transitions
         if state.missed_count <= PatternObligationManager.MAX_MISSED_FOR_ACTIVE:
             state.status = 'ACTIVE'  # Still active, but degraded
-            logger.info(f"[OBLIGATION_MGR] Pattern remains ACTIVE")
+            logger.info("[OBLIGATION_MGR] Pattern remains ACTIVE")
         elif state.missed_count <= PatternObligationManager.MAX_MISSED_FOR_PAUSED:
             state.status = 'PAUSED'  # Paused, waiting for recovery
-            logger.warning(f"[OBLIGATION_MGR] Pattern degraded to PAUSED")
+            logger.warning("[OBLIGATION_MGR] Pattern degraded to PAUSED")
         else:
             state.status = 'BROKEN'  # Too many misses
-            logger.error(f"[OBLIGATION_MGR] Pattern marked as BROKEN")
+            logger.error("[OBLIGATION_MGR] Pattern marked as BROKEN")
         
         # Advance expected date (even when missed)
         # This prevents cascading miss detection
@@ -297,8 +297,8 @@ class PatternObligationManager:
             state.interval_days
         )
         
-        logger.debug(f"[OBLIGATION_MGR] Creating obligation: expected_date={state.next_expected_date.date()}, "
-                    f"tolerance=±{tolerance}d, amount_range=[{expected_min_amount}, {expected_max_amount}]")
+        logger.debug("[OBLIGATION_MGR] Creating obligation: expected_date=%s, tolerance=±%sd, amount_range=[%s, %s]",
+                     state.next_expected_date.date(), tolerance, expected_min_amount, expected_max_amount)
         
         return Obligation(
             pattern_id=state.pattern_id,
@@ -335,11 +335,12 @@ class PatternObligationManager:
         Used for budgeting/forecasting, NOT for matching.
         """
         if not recent_amounts:
-            logger.debug(f"[OBLIGATION_MGR] No recent amounts for estimation")
+            logger.debug("[OBLIGATION_MGR] No recent amounts for estimation")
             return (Decimal('0'), Decimal('0'))
         
         avg = sum(recent_amounts) / len(recent_amounts)
-        logger.debug(f"[OBLIGATION_MGR] Estimating amount range: behavior={amount_behavior.value}, avg={avg:.2f}, n={len(recent_amounts)}")
+        logger.debug("[OBLIGATION_MGR] Estimating amount range: behavior=%s, avg=%.2f, n=%d",
+                     amount_behavior.value, avg, len(recent_amounts))
         
         if amount_behavior == AmountBehaviorType.FIXED:
             # Tight range
@@ -378,51 +379,64 @@ class TransactionProcessor:
         Returns:
             List of (updated_state, was_matched) tuples
         """
-        logger.debug(f"[TRANSACTION_PROCESSOR] Processing transaction: date={transaction_date.date()}, "
-                    f"amount={transaction_amount:.2f}, against {len(active_patterns)} patterns")
-        
-        results = []
-        
-        for idx, state in enumerate(active_patterns, 1):
-            logger.debug(f"[TRANSACTION_PROCESSOR] Checking pattern {idx}/{len(active_patterns)}: "
-                        f"pattern_id={state.pattern_id}, expected={state.next_expected_date.date()}")
-            # Check if transaction fulfills this pattern's obligation
-            tolerance = PatternObligationManager.compute_tolerance_window(
-                state.pattern_case,
-                state.interval_days
+        logger.debug("[TRANSACTION_PROCESSOR] Processing transaction: date=%s, amount=%s, against %d patterns",
+                     transaction_date, transaction_amount, len(active_patterns))
+        
+        return [
+            TransactionProcessor.process_for_pattern(transaction_date, state, current_date)
+            for state in active_patterns
+        ]
+    
+    @staticmethod
+    def process_for_pattern(
+        transaction_date: datetime,
+        state: PatternState,
+        current_date: datetime
+    ) -> Tuple[PatternState, bool]:
+        """
+        Match a transaction against a single pattern state.
+        
+        The per-pattern step of process_transaction, callable directly by
+        code that already iterates patterns one at a time (no list wrapping).
+        
+        Returns:
+            (updated_state, was_matched)
+        """
+        # Check if transaction fulfills this pattern's obligation
+        tolerance = PatternObligationManager.compute_tolerance_window(
+            state.pattern_case,
+            state.interval_days
+        )
+        
+        is_match, days_early = PatternObligationManager.check_obligation_match(
+            transaction_date=transaction_date,
+            expected_date=state.next_expected_date,
+            tolerance_days=tolerance
+        )
+        
+        if is_match:
+            # Fulfill obligation
+            logger.debug("[TRANSACTION_PROCESSOR] Transaction matched pattern %s, fulfilling obligation", state.pattern_id)
+            updated_state = PatternObligationManager.fulfill_obligation(
+                state=state,
+                actual_transaction_date=transaction_date,
+                days_early=days_early
             )
-            
-            is_match, days_early = PatternObligationManager.check_obligation_match(
-                transaction_date=transaction_date,
-                expected_date=state.next_expected_date,
-                tolerance_days=tolerance
+            return (updated_state, True)
+        
+        # No match - check if obligation is overdue
+        logger.debug("[TRANSACTION_PROCESSOR] Transaction did not match pattern %s", state.pattern_id)
+        if PatternObligationManager.is_obligation_overdue(
+            state.next_expected_date,
+            tolerance,
+            current_date
+        ):
+            # Handle missed obligation
+            updated_state = PatternObligationManager.handle_missed_obligation(
+                state=state,
+                current_date=current_date
             )
-            
-            if is_match:
-                # Fulfill obligation
-                logger.info(f"[TRANSACTION_PROCESSOR] Transaction matched pattern {idx}, fulfilling obligation")
-                updated_state = PatternObligationManager.fulfill_obligation(
-                    state=state,
-                    actual_transaction_date=transaction_date,
-                    days_early=days_early
-                )
-                results.append((updated_state, True))
-            else:
-                # No match - check if obligation is overdue
-                logger.debug(f"[TRANSACTION_PROCESSOR] Transaction did not match pattern {idx}")
-                if PatternObligationManager.is_obligation_overdue(
-                    state.next_expected_date,
-                    tolerance,
-                    current_date
-                ):
-                    # Handle missed obligation
-                    updated_state = PatternObligationManager.handle_missed_obligation(
-                        state=state,
-                        current_date=current_date
-                    )
-                    results.append((updated_state, False))
-                else:
-                    # No match yet, but not overdue - keep waiting
-                    results.append((state, False))
-        
-        return results
+            return (updated_state, False)
+        
+        # No match yet, but not overdue - keep waiting
+        return (state, False)
@@ -282,8 +282,8 @@ Be precise with amounts and dates. Remove commas from numbers."""
     ) -> str:
         """Query the LLM model for transaction extraction."""
         try:
-            from google.genai import Client
-            client = Client()
+            from agent.llm_client import get_genai_client
+            client = get_genai_client()
 
             context = f"SMS Body: {sms_body}"
             if sender:
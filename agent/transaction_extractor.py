@@ -357,8 +357,8 @@ If any information is missing, make a reasonable inference based on the email co
 
     def _query_model(self, email_content: str) -> str:
         try:
-            from google.genai import Client
-            client = Client()
+            from agent.llm_client import get_genai_client
+            client = get_genai_client()
 
             prompt = f"""{self._system_message}
 
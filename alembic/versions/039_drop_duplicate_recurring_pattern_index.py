@@ -0,0 +1,31 @@
+"""drop duplicate recurring_patterns (user, transactor, direction) index
+
+ix_recurring_patterns_user_transactor_direction has the same columns as the
+unique uq_recurring_patterns_user_transactor_direction index, which already
+serves the pattern lookups in discovery and streak updates (at most one row
+per key, so adding status to the key would not narrow anything). The copy
+only added write cost to every pattern insert/update.
+
+Revision ID: 039
+Revises: 038
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = '039'
+down_revision = '038'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_recurring_patterns_user_transactor_direction', table_name='recurring_patterns')
+
+
+def downgrade():
+    op.create_index(
+        'ix_recurring_patterns_user_transactor_direction',
+        'recurring_patterns',
+        ['user_id', 'transactor_id', 'direction'],
+        unique=False,
+    )
@@ -0,0 +1,25 @@
+"""Add last_history_id to users for Gmail History API incremental sync
+
+Stores the mailbox historyId captured at the start of the last completed
+sync. Incremental syncs ask users.history.list for messages added since
+then and only download those, instead of re-listing the whole date window.
+
+Revision ID: 040
+Revises: 039
+Create Date: 2026-10-17
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = '040'
+down_revision = '039'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('last_history_id', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'last_history_id')
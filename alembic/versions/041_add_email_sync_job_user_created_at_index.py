@@ -0,0 +1,39 @@
+"""index email_transaction_sync_jobs by (user_id, created_at)
+
+The status and history endpoints read a user's jobs newest first. With only
+the single-column user_id index Postgres fetches every job the user has and
+sorts them; the composite index returns them in order and stops at the
+LIMIT. It also serves any lookup by user_id alone, so the single-column
+index is dropped. Lookups of a user's processing job keep using the partial
+unique index uq_transaction_sync_jobs_user_processing.
+
+Revision ID: 041
+Revises: 040
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = '041'
+down_revision = '040'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_email_transaction_sync_jobs_user_created_at',
+        'email_transaction_sync_jobs',
+        ['user_id', 'created_at'],
+        unique=False,
+    )
+    op.drop_index('ix_email_transaction_sync_jobs_user_id', table_name='email_transaction_sync_jobs')
+
+
+def downgrade():
+    op.create_index(
+        'ix_email_transaction_sync_jobs_user_id',
+        'email_transaction_sync_jobs',
+        ['user_id'],
+        unique=False,
+    )
+    op.drop_index('ix_email_transaction_sync_jobs_user_created_at', table_name='email_transaction_sync_jobs')
@@ -29,6 +29,10 @@ celery_app.conf.update(
     worker_max_tasks_per_child=50,  # Restart worker after 50 tasks (prevent memory leaks)
     broker_connection_retry_on_startup=True,
     result_expires=3600,  # Results expire after 1 hour
+    # Redis redelivers unacked messages after this long; keep it above the
+    # longest task (initial email sync: time_limit=7800) so acks_late tasks
+    # aren't handed to a second worker while still running
+    broker_transport_options={'visibility_timeout': 3 * 3600},
 )
 
 # Celery Beat schedule for periodic tasks
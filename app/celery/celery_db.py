@@ -1,13 +1,20 @@
+from celery.signals import worker_process_init
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.pool import NullPool
 from app.config import settings
+from app.db import ASYNCPG_CONNECT_ARGS
 
-# NullPool: no connection reuse. Each session creates a fresh asyncpg connection
-# bound to the current event loop, avoiding the "Future attached to a different loop"
-# error that occurs when Celery prefork workers inherit the parent's pooled connections.
+# Tasks run on one persistent event loop per worker process (see run_async in
+# celery_tasks), so pooled asyncpg connections stay bound to the loop that
+# opened them and can be reused across tasks instead of reconnecting for
+# every session. The pool is small (CELERY_DB_POOL_SIZE): a prefork child runs
+# one task at a time.
 celery_async_engine = create_async_engine(
     settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
-    poolclass=NullPool,
+    pool_size=settings.CELERY_DB_POOL_SIZE,
+    max_overflow=settings.CELERY_DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    pool_pre_ping=True,
+    connect_args=ASYNCPG_CONNECT_ARGS,
     echo=False,
 )
 
@@ -16,3 +23,10 @@ CeleryAsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession,
     expire_on_commit=False,
 )
+
+
+@worker_process_init.connect
+def _reset_pool_after_fork(**kwargs):
+    # Never reuse connections inherited from the parent process: they belong to
+    # another process's event loop. close=False leaves the parent's sockets alone.
+    celery_async_engine.sync_engine.dispose(close=False)
@@ -1,30 +1,71 @@
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import asyncio
 
 from celery.utils.log import get_task_logger
+try:
+    import uvloop
+except ImportError:  # not available on Windows; fall back to the stdlib loop
+    uvloop = None
 from app.celery.celery_app import celery_app
-from app.models import Transaction, EmailTransactionSyncJob
+from app.models import Transaction
 from app.models.user import User
 from app.celery.celery_db import CeleryAsyncSessionLocal as AsyncSessionLocal
 from sqlalchemy import select
 from app.celery.email_processing_helper import (
+    fail_stale_email_sync_jobs,
     fetch_user_emails_async,
     schedule_incremental_sync_async,
 )
-from app.celery.sms_processing_helper import process_sms_batch_async
+from app.celery.sms_processing_helper import SmsBatchError, process_sms_batch_async
+from app.config import settings
+from app.services.pattern_cache import cache_no_pattern, get_cached_no_pattern
 
 logger = get_task_logger(__name__)
 
 
+_worker_loop = None
+
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Return this process's event loop, creating it on first use."""
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        # libuv-backed loop where available: cheaper callbacks and socket I/O
+        # for the asyncpg/Gmail-heavy tasks
+        _worker_loop = uvloop.new_event_loop() if uvloop else asyncio.new_event_loop()
+        # Python 3.12+: run new tasks synchronously until their first real
+        # suspension, so gather() over cache hits skips a scheduler round-trip
+        if hasattr(asyncio, "eager_task_factory"):
+            _worker_loop.set_task_factory(asyncio.eager_task_factory)
+        # Size the default executor to the work we offload instead of Python's
+        # min(32, cpu_count + 4), which oversubscribes the prefork children
+        _worker_loop.set_default_executor(
+            ThreadPoolExecutor(max_workers=max(
+                settings.EMAIL_PARSE_CONCURRENCY,
+                settings.SMS_PARSE_CONCURRENCY,
+            ))
+        )
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
 def run_async(coro):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    # Reuse one loop per worker process: the pooled DB connections in
+    # celery_db are bound to it and survive between tasks
+    loop = _get_worker_loop()
     try:
         return loop.run_until_complete(coro)
-    finally:
-        loop.close()
-        asyncio.set_event_loop(None)
+    except BaseException:
+        # e.g. SoftTimeLimitExceeded raised while the loop was running: don't
+        # leave this task's coroutines pending to resume inside the next task
+        pending = asyncio.all_tasks(loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        raise
 
 
 # ==============================================================================
@@ -32,21 +73,33 @@ def run_async(coro):
 # ==============================================================================
 
 @celery_app.task(bind=True, max_retries=2)
-def update_recurring_streak(self, user_id: str, transactor_id: str, direction: str, transaction_date: str):
+def update_recurring_streak(
+    self,
+    user_id: str,
+    transactor_id: str,
+    direction: str,
+    transaction_date: Optional[str] = None,
+    transaction_id: Optional[str] = None,
+):
+    if get_cached_no_pattern(user_id, [(transactor_id, direction)])[0]:
+        return {'status': 'no_pattern_cached'}
+    no_pattern = []
+
     async def inner():
         async with AsyncSessionLocal() as db:
-            from datetime import datetime as dt
-            txn_date = dt.fromisoformat(transaction_date)
-
-            tx_result = await db.execute(
-                select(Transaction).where(
-                    (Transaction.user_id == user_id) &
-                    (Transaction.transactor_id == transactor_id) &
-                    (Transaction.type == direction) &
-                    (Transaction.date == txn_date)
-                ).order_by(Transaction.date.desc()).limit(1)
-            )
-            transaction = tx_result.scalar()
+            if transaction_id:
+                transaction = await db.get(Transaction, transaction_id)
+            else:
+                # Messages queued before transaction_id was passed
+                tx_result = await db.execute(
+                    select(Transaction).where(
+                        (Transaction.user_id == user_id) &
+                        (Transaction.transactor_id == transactor_id) &
+                        (Transaction.type == direction) &
+                        (Transaction.date == datetime.fromisoformat(transaction_date))
+                    ).order_by(Transaction.date.desc()).limit(1)
+                )
+                transaction = tx_result.scalar()
 
             if not transaction:
                 logger.warning(f"[PATTERN] Transaction not found for user {user_id}, transactor {transactor_id}")
@@ -57,7 +110,9 @@ def update_recurring_streak(self, user_id: str, transactor_id: str, direction: s
 
                 pattern_service = PatternService(db)
                 result = await pattern_service.process_new_transaction(transaction.id)
-                logger.info(f"[PATTERN] Processing result: {result}")
+                if result.get('reason') == 'No active patterns':
+                    no_pattern.append((transactor_id, direction))
+                logger.debug("[PATTERN] Processing result: %s", result)
                 return {
                     'status': 'processed',
                     'matched': result.get('matched', False),
@@ -68,17 +123,66 @@ def update_recurring_streak(self, user_id: str, transactor_id: str, direction: s
                 raise
 
     try:
-        return run_async(inner())
+        result = run_async(inner())
     except Exception as e:
         logger.error(f"[PATTERN] Pattern processing failed: {e}", exc_info=True)
         raise self.retry(exc=e, countdown=30 * (self.request.retries + 1))
+    cache_no_pattern(user_id, no_pattern)
+    return result
+
+
+@celery_app.task(bind=True, max_retries=2)
+def update_recurring_streaks_batch(self, user_id: str, items: List[dict]):
+    """
+    Task B for many transactions of one user: one session, one commit.
+
+    Each item carries transaction_id, transactor_id and direction
+    (see transaction_handler.streak_update_item).
+    """
+    cached = get_cached_no_pattern(user_id, [(item['transactor_id'], item['direction']) for item in items])
+    pending = [item for item, is_cached in zip(items, cached) if not is_cached]
+    if not pending:
+        return {'status': 'no_pattern_cached', 'processed': 0}
+    no_pattern = []
+
+    async def inner():
+        async with AsyncSessionLocal() as db:
+            from app.services.pattern_service import PatternService
+
+            pattern_service = PatternService(db)
+            results = await pattern_service.process_new_transactions(
+                [item['transaction_id'] for item in pending]
+            )
+
+            matched = 0
+            for item in pending:
+                result = results.get(item['transaction_id'], {})
+                if result.get('reason') == 'No active patterns':
+                    no_pattern.append((item['transactor_id'], item['direction']))
+                if result.get('matched'):
+                    matched += 1
+
+            logger.info(f"[PATTERN] Batch processed {len(pending)} transactions for user {user_id}: {matched} matched")
+            return {'status': 'processed', 'processed': len(pending), 'matched': matched}
+
+    try:
+        result = run_async(inner())
+    except Exception as e:
+        logger.error(f"[PATTERN] Batch pattern processing failed for user {user_id}: {e}", exc_info=True)
+        raise self.retry(exc=e, countdown=30 * (self.request.retries + 1))
+    # Written once the session is closed: one Redis round trip for the batch
+    cache_no_pattern(user_id, no_pattern)
+    return result
 
 
 # ==============================================================================
 # EMAIL PROCESSING TASKS
 # ==============================================================================
 
-@celery_app.task(bind=True, max_retries=3, soft_time_limit=7200, time_limit=7800)
+# Email syncs ack only after finishing: if the worker node goes away mid-sync
+# the message is redelivered (after the broker visibility timeout, by which
+# time the stale-job sweep has freed the user's job slot)
+@celery_app.task(bind=True, max_retries=3, soft_time_limit=7200, time_limit=7800, acks_late=True)
 def fetch_user_emails_initial(self, user_id: str, months: int = 3):
     try:
         return run_async(fetch_user_emails_async(user_id, is_initial=True, months=months))
@@ -87,7 +191,7 @@ def fetch_user_emails_initial(self, user_id: str, months: int = 3):
         raise self.retry(exc=exc, countdown=60 * (self.request.retries + 1))
 
 
-@celery_app.task(bind=True, max_retries=3)
+@celery_app.task(bind=True, max_retries=3, acks_late=True)
 def fetch_user_emails_incremental(self, user_id: str):
     try:
         return run_async(fetch_user_emails_async(user_id, is_initial=False))
@@ -106,14 +210,45 @@ def schedule_incremental_sync():
 # ==============================================================================
 
 @celery_app.task(bind=True, max_retries=3)
-def process_sms_batch_task(self, user_id: str, messages_data: List[dict]):
+def process_sms_batch_task(self, user_id: str, messages_data: List[dict], job_id: Optional[str] = None):
+    final_attempt = self.request.retries >= self.max_retries
     try:
-        return run_async(process_sms_batch_async(user_id, messages_data))
+        return run_async(process_sms_batch_async(user_id, messages_data, job_id, final_attempt))
+    except SmsBatchError as exc:
+        logger.error(f"SMS batch task failed for user {user_id}: {exc}", exc_info=True)
+        # Resume after the chunks already saved and counted, against the same
+        # job, so a retry neither counts them twice nor starts a new job
+        raise self.retry(
+            exc=exc,
+            args=(user_id, messages_data[exc.committed_messages:], exc.job_id),
+            kwargs={},
+            countdown=60 * (self.request.retries + 1),
+        )
     except Exception as exc:
         logger.error(f"SMS batch task failed for user {user_id}: {exc}", exc_info=True)
         raise self.retry(exc=exc, countdown=60 * (self.request.retries + 1))
 
 
+def enqueue_sms_batches(payloads: List[Tuple[str, List[dict], Optional[str]]]) -> List[str]:
+    """
+    Queue process_sms_batch_task for several (user_id, messages_data, job_id) payloads.
+
+    The tasks are sent as one group, so they are published over a single
+    broker connection instead of one .delay() round trip each.
+
+    Returns:
+        The queued task ids, in payload order
+    """
+    if not payloads:
+        return []
+
+    from celery import group
+    result = group(
+        process_sms_batch_task.s(*payload) for payload in payloads
+    ).apply_async()
+    return [task.id for task in result.results]
+
+
 # ==============================================================================
 # SPENDING ANALYSIS TASKS
 # ==============================================================================
@@ -141,9 +276,11 @@ def analyze_spending_patterns(self, user_id: str):
 def schedule_spending_analysis():
     """Fan out pattern analysis to all users."""
     async def get_user_ids():
+        # Only the id is needed: stream it instead of loading full User rows
+        # (credentials and token blobs included)
         async with AsyncSessionLocal() as session:
-            users = (await session.execute(select(User))).scalars().all()
-            return [str(u.id) for u in users]
+            result = await session.stream_scalars(select(User.id))
+            return [str(user_id) async for user_id in result]
 
     user_ids = run_async(get_user_ids())
     if not user_ids:
@@ -162,29 +299,13 @@ def schedule_spending_analysis():
 def cleanup_stale_email_sync_jobs():
     async def cleanup():
         async with AsyncSessionLocal() as db:
-            stale_threshold = datetime.utcnow() - timedelta(hours=2)
-            result = await db.execute(
-                select(EmailTransactionSyncJob)
-                .where(EmailTransactionSyncJob.status == 'processing')
-                .where(EmailTransactionSyncJob.started_at < stale_threshold)
-            )
-            stale_jobs = result.scalars().all()
-
-            for job in stale_jobs:
-                logger.warning(f"Marking stale job {job.id} as FAILED (started {job.started_at})")
-                job.status = 'failed'
-                job.completed_at = datetime.utcnow()
-                if job.error_log is None:
-                    job.error_log = []
-                job.error_log.append({
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "error": "Job marked stale (PROCESSING for >2 hours)",
-                })
-
-            if stale_jobs:
+            stale_job_ids = await fail_stale_email_sync_jobs(db)
+
+            if stale_job_ids:
                 await db.commit()
-                logger.info(f"Cleaned up {len(stale_jobs)} stale email sync jobs")
+                logger.warning(f"Marked stale email sync jobs as FAILED: {[str(job_id) for job_id in stale_job_ids]}")
+                logger.info(f"Cleaned up {len(stale_job_ids)} stale email sync jobs")
 
-            return {"cleaned_jobs": len(stale_jobs)}
+            return {"cleaned_jobs": len(stale_job_ids)}
 
     return run_async(cleanup())
@@ -1,31 +1,57 @@
 from celery.utils.log import get_task_logger
 from datetime import datetime, timedelta, timezone
 from typing import List
+import asyncio
+import time
+from sqlalchemy import func, literal, or_, text, update
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
 from sqlalchemy.future import select
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 
 from app.celery.celery_db import CeleryAsyncSessionLocal as AsyncSessionLocal
-from app.services.transaction_handler import handle_new_transaction
+from app.celery.transaction_batch_helper import (
+    SELECT_EXISTING_MESSAGE_IDS,
+    append_error_log,
+    parse_transaction_date,
+    save_parsed_transactions,
+)
+from app.services.transaction_handler import streak_update_item, queue_streak_updates
 from app.models.user import User
 from app.models.email_transaction_sync_job import EmailTransactionSyncJob, JobStatus
-from app.models.transaction import Transaction as DBTransaction
-from app.models.category import Category
-from app.models.transactor import Transactor
-from app.models.currency import Currency
-from app.models.account import Account
 from app.services.google.mail import GmailService
-from app.services.account_service import get_or_create_account
 from agent.coordinator import EmailProcessingCoordinator
 from app.config import settings
 
 logger = get_task_logger(__name__)
 
 BATCH_SIZE = 100
+# Minimum seconds between commits that only persist job progress counters
+PROGRESS_COMMIT_INTERVAL_SECONDS = 5.0
+# Per-email failures logged with a traceback per batch; the rest log one line
+# (the error is still recorded in job.error_log)
+MAX_TRACEBACKS_PER_BATCH = 3
+
+# Gmail search query, built once per worker from the configured allowlists
+BANK_EMAIL_QUERY = GmailService.build_bank_query(
+    sender_allowlist=[s.strip() for s in settings.EMAIL_SENDER_ALLOWLIST.split(",") if s.strip()],
+    excluded_categories=[c.strip() for c in settings.EMAIL_EXCLUDED_CATEGORIES.split(",") if c.strip()],
+)
 
 
 async def fetch_user_emails_async(user_id: str, is_initial: bool = False, months: int = 3):
     async with AsyncSessionLocal() as session:
-        user = (await session.execute(select(User).filter_by(id=user_id))).scalar_one_or_none()
+        # Only the sync state and Gmail credentials are used; skip the
+        # profile and OAuth token columns
+        user = (await session.execute(
+            select(User)
+            .options(load_only(
+                User.google_credentials_json,
+                User.google_token_pickle,
+                User.last_email_fetch_time,
+                User.last_history_id,
+            ))
+            .filter_by(id=user_id)
+        )).scalar_one_or_none()
         if not user:
             logger.error(f"User {user_id} not found")
             return {"status": "error", "message": "User not found"}
@@ -34,29 +60,35 @@ async def fetch_user_emails_async(user_id: str, is_initial: bool = False, months
             logger.info(f"User {user_id} has no Gmail credentials, skipping sync")
             return {"status": "skipped", "message": "No Gmail credentials"}
 
-        existing_job = (await session.execute(
-            select(EmailTransactionSyncJob).filter_by(user_id=user_id, status=JobStatus.PROCESSING)
+        # Claim the user's single PROCESSING slot atomically: the partial unique
+        # index on (user_id) WHERE status = 'processing' turns a concurrent or
+        # already-running sync into a no-op insert instead of an error
+        job = (await session.execute(
+            pg_insert(EmailTransactionSyncJob)
+            .values(
+                user_id=user_id,
+                status=JobStatus.PROCESSING,
+                is_initial=is_initial,
+                started_at=datetime.now(timezone.utc),
+            )
+            .on_conflict_do_nothing(
+                index_elements=[EmailTransactionSyncJob.user_id],
+                # Literal predicate: the index is only inferred if it is implied
+                index_where=text("status = 'processing'"),
+            )
+            .returning(EmailTransactionSyncJob)
         )).scalar_one_or_none()
-        if existing_job:
-            logger.info(f"Sync already in-progress for user {user_id}, skipping (job: {existing_job.id})")
-            return {"status": "skipped", "message": "Another sync job is already processing"}
-
-        job = EmailTransactionSyncJob(
-            user_id=user_id,
-            status=JobStatus.PROCESSING,
-            is_initial=is_initial,
-            started_at=datetime.now(timezone.utc),
-        )
-        session.add(job)
-        try:
-            await session.commit()
-            await session.refresh(job)
-        except IntegrityError:
+        if job is None:
             await session.rollback()
-            return {"status": "skipped", "message": "Concurrent job already processing"}
+            logger.info(f"Sync already in-progress for user {user_id}, skipping")
+            return {"status": "skipped", "message": "Another sync job is already processing"}
+        await session.commit()
 
         try:
-            fetcher = GmailService(
+            # GmailService is synchronous (googleapiclient/httplib2): run its
+            # network calls in a thread so they don't stall the event loop
+            fetcher = await asyncio.to_thread(
+                GmailService,
                 credentials_data=user.google_credentials_json,
                 token_data=user.google_token_pickle
             )
@@ -74,37 +106,81 @@ async def fetch_user_emails_async(user_id: str, is_initial: bool = False, months
 
             logger.info(f"{'Initial' if is_initial else 'Incremental'} sync for user {user_id}: fetching since {since_date}")
 
-            all_emails = fetcher.fetch_bank_emails(
-                since_date=since_date,
-                ascending=settings.EMAIL_FETCH_ASCENDING,
-                max_results=None
-            )
+            # Capture the mailbox position before listing so mail arriving
+            # mid-sync is picked up next time (dedupe absorbs any overlap)
+            start_history_id = await asyncio.to_thread(fetcher.get_latest_history_id)
+            added_ids = None
+            if not is_initial and user.last_history_id:
+                added_ids = await asyncio.to_thread(fetcher.list_added_message_ids, user.last_history_id)
+
+            # List matching message IDs up front (cheap), then download and
+            # process message bodies one batch at a time so memory stays
+            # bounded by BATCH_SIZE rather than the size of the mailbox
+            if added_ids is not None and not added_ids:
+                message_ids = []  # History API: nothing arrived since the last sync
+            else:
+                message_ids = await asyncio.to_thread(
+                    fetcher.list_bank_message_ids,
+                    since_date=since_date,
+                    query=BANK_EMAIL_QUERY,
+                    ascending=settings.EMAIL_FETCH_ASCENDING,
+                    max_results=None
+                )
+                if added_ids is not None:
+                    # Keep only bank emails that are actually new, not ones
+                    # near the date boundary that were imported last time
+                    added = set(added_ids)
+                    message_ids = [message_id for message_id in message_ids if message_id in added]
 
-            job.total_emails = len(all_emails)
+            job.total_emails = len(message_ids)
             await session.commit()
 
-            if not all_emails:
+            if not message_ids:
                 logger.info(f"No new emails for user {user_id}")
+                if start_history_id:
+                    user.last_history_id = start_history_id
                 job.status = JobStatus.COMPLETED
                 job.completed_at = datetime.now(timezone.utc)
                 await session.commit()
                 return {"status": "success", "message": "No new emails"}
 
-            logger.info(f"Found {len(all_emails)} emails for user {user_id}. Processing in batches...")
+            logger.info(f"Found {len(message_ids)} emails for user {user_id}. Processing in batches...")
 
-            for i in range(0, len(all_emails), BATCH_SIZE):
-                batch = all_emails[i:i + BATCH_SIZE]
-                await process_email_batch(session, batch, coordinator, user_id, job)
-                await session.commit()  # persist job stats after each batch
+            latest_email_date = None
+            last_progress_commit = time.monotonic()
+            # Download the next batch while the current one is parsed and
+            # written, so Gmail I/O overlaps the LLM and DB work
+            next_batch = asyncio.ensure_future(
+                asyncio.to_thread(fetcher.get_email_contents, message_ids[:BATCH_SIZE])
+            )
+            for i in range(0, len(message_ids), BATCH_SIZE):
+                batch = await next_batch
+                next_ids = message_ids[i + BATCH_SIZE:i + 2 * BATCH_SIZE]
+                if next_ids:
+                    next_batch = asyncio.ensure_future(
+                        asyncio.to_thread(fetcher.get_email_contents, next_ids)
+                    )
+                for email_item in batch:
+                    if len(email_item) >= 4 and isinstance(email_item[3], datetime):
+                        if latest_email_date is None or email_item[3] > latest_email_date:
+                            latest_email_date = email_item[3]
+                if await process_email_batch(session, batch, coordinator, user_id, job):
+                    last_progress_commit = time.monotonic()
+                elif time.monotonic() - last_progress_commit >= PROGRESS_COMMIT_INTERVAL_SECONDS:
+                    # Batches without new transactions only move the progress
+                    # counters; persist those at most every few seconds
+                    await session.commit()
+                    last_progress_commit = time.monotonic()
                 logger.info(f"Progress: {job.processed_emails}/{job.total_emails} for user {user_id}")
 
             # Update last_email_fetch_time to the latest email seen
-            await session.refresh(user)
-            email_dates = [e[3] for e in all_emails if len(e) >= 4 and isinstance(e[3], datetime)]
-            if email_dates:
-                latest = max(email_dates)
-                if user.last_email_fetch_time is None or latest > user.last_email_fetch_time:
-                    user.last_email_fetch_time = latest
+            await session.refresh(user, ["last_email_fetch_time"])
+            if latest_email_date is not None:
+                if user.last_email_fetch_time is None or latest_email_date > user.last_email_fetch_time:
+                    user.last_email_fetch_time = latest_email_date
+            # Advance the history cursor only once every listed email was processed
+            if start_history_id:
+                user.last_history_id = start_history_id
 
             job.status = JobStatus.COMPLETED
             job.completed_at = datetime.now(timezone.utc)
@@ -121,38 +197,85 @@ async def fetch_user_emails_async(user_id: str, is_initial: bool = False, months
 
         except Exception as e:
             logger.error(f"Error processing emails for user {user_id}: {e}", exc_info=True)
+            await session.rollback()
             await session.refresh(job)
+            failed_at = datetime.now(timezone.utc)
             job.status = JobStatus.FAILED
-            job.completed_at = datetime.now(timezone.utc)
-            if job.error_log is None:
-                job.error_log = []
-            job.error_log.append({
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+            job.completed_at = failed_at
+            append_error_log(job, [{
+                "timestamp": failed_at.isoformat(),
                 "error": str(e),
                 "error_type": type(e).__name__,
-            })
+            }])
             await session.commit()
             raise
 
 
-async def process_email_batch(session, emails: List, coordinator: EmailProcessingCoordinator, user_id: str, job: EmailTransactionSyncJob):
-    # Accumulate stats in local vars — ORM object state resets on rollback
+def _email_error(message_id, subject, error: Exception) -> dict:
+    return {
+        "message_id": message_id,
+        "subject": subject[:100] if subject else "",
+        "error": str(error),
+        "error_type": type(error).__name__,
+    }
+
+
+async def process_email_batch(session, emails: List, coordinator: EmailProcessingCoordinator, user_id: str, job: EmailTransactionSyncJob) -> bool:
+    """
+    Parse and store one batch of emails, adding its counts to job.
+
+    Returns:
+        True if the batch was committed, False if it only left progress
+        counters on job for the caller to commit
+    """
+    # Accumulate stats in local vars and apply them to job once at the end
     batch_parsed = 0
     batch_failed = 0
     batch_skipped = 0
     batch_processed = 0
     batch_errors = []
 
+    # Pass 1: drop emails that already produced a transaction (one query for
+    # the batch) before they reach the coordinator, the expensive step.
+    seen_ids = set((await session.execute(
+        SELECT_EXISTING_MESSAGE_IDS,
+        {"message_ids": [email_item[0] for email_item in emails]},
+    )).scalars().all())
+
+    # Pass 2: parse the remaining emails. The coordinator needs no DB access
+    # and spends most of its time waiting on the LLM, so emails are parsed
+    # concurrently in worker threads; the session is only touched afterwards.
+    candidates = []
     for email_item in emails:
-        message_id = None
-        subject = None
         batch_processed += 1
+        message_id = email_item[0]
+        if message_id in seen_ids:
+            batch_skipped += 1
+            logger.debug(f"Duplicate transaction for message_id {message_id}, skipping")
+            continue
+        seen_ids.add(message_id)
+        candidates.append(email_item)
+
+    semaphore = asyncio.Semaphore(settings.EMAIL_PARSE_CONCURRENCY)
+
+    async def parse(email_item):
+        message_id, subject, body = email_item[:3]
+        sender_email = email_item[4] if len(email_item) > 4 else None
+        async with semaphore:
+            return await asyncio.to_thread(
+                coordinator.process_email, message_id, subject, body, sender_email
+            )
 
-        try:
-            message_id, subject, body = email_item[:3]
-            sender_email = email_item[4] if len(email_item) > 4 else None
+    results = await asyncio.gather(*(parse(item) for item in candidates), return_exceptions=True)
 
-            result = coordinator.process_email(message_id, subject, body, sender_email)
+    parsed = []
+    for email_item, result in zip(candidates, results):
+        message_id = email_item[0]
+        subject = email_item[1] if len(email_item) > 1 else None
+
+        try:
+            if isinstance(result, BaseException):
+                raise result
 
             if not result.processed:
                 batch_skipped += 1
@@ -163,128 +286,136 @@ async def process_email_batch(session, emails: List, coordinator: EmailProcessin
                 batch_failed += 1
                 continue
 
-            # Category
-            category = (await session.execute(
-                select(Category).filter_by(label=transaction.category)
-            )).scalar_one_or_none()
-            if not category:
-                category = Category(label=transaction.category)
-                session.add(category)
-                await session.flush()
-
-            # Transactor
-            transactor = None
-            if transaction.transactor_source_id:
-                transactor = (await session.execute(
-                    select(Transactor).filter_by(source_id=transaction.transactor_source_id, user_id=user_id)
-                )).scalar_one_or_none()
-            if not transactor and transaction.transactor:
-                transactor = (await session.execute(
-                    select(Transactor).filter_by(name=transaction.transactor, user_id=user_id)
-                )).scalar_one_or_none()
-            if not transactor:
-                transactor = Transactor(
-                    name=transaction.transactor or "Unknown",
-                    source_id=transaction.transactor_source_id,
-                    user_id=user_id
-                )
-                session.add(transactor)
-                await session.flush()
-            elif transaction.transactor_source_id and not transactor.source_id:
-                transactor.source_id = transaction.transactor_source_id
-
-            # Currency (default INR)
-            currency = (await session.execute(
-                select(Currency).filter_by(value="INR")
-            )).scalar_one_or_none()
-            if not currency:
-                currency = Currency(name="Indian Rupee", value="INR", country="India")
-                session.add(currency)
-                await session.flush()
-
-            # Account
-            account = None
-            if transaction.account_last_four:
-                account = await get_or_create_account(
-                    session=session,
-                    user_id=user_id,
-                    account_last_four=transaction.account_last_four,
-                    bank_name=transaction.bank_name or "Unknown",
-                    account_type=getattr(transaction, 'account_type', 'savings')
-                )
-
-            db_transaction = DBTransaction(
-                amount=transaction.amount,
-                type=transaction.transaction_type.value,
-                date=datetime.strptime(transaction.date, "%Y-%m-%d %H:%M:%S"),
-                description=transaction.description,
-                confidence=str(transaction.confidence),
-                user_id=user_id,
-                category_id=category.id,
-                transactor_id=transactor.id,
-                currency_id=currency.id,
-                message_id=message_id,
-                account_id=account.id if account else None,
-            )
-            session.add(db_transaction)
-            await session.commit()
-
-            await handle_new_transaction(db_transaction)
-            batch_parsed += 1
-
-        except IntegrityError:
-            await session.rollback()
-            batch_skipped += 1
-            logger.debug(f"Duplicate transaction for message_id {message_id}, skipping")
+            txn_date = parse_transaction_date(transaction.date)
+            parsed.append((message_id, subject, transaction, txn_date))
 
         except Exception as e:
-            await session.rollback()
             batch_failed += 1
-            batch_errors.append({
-                "message_id": message_id,
-                "subject": subject[:100] if subject else "",
-                "error": str(e),
-                "error_type": type(e).__name__,
-            })
-            logger.error(f"Error processing email {message_id}: {e}", exc_info=True)
+            batch_errors.append(_email_error(message_id, subject, e))
+            logger.warning(
+                "Error processing email %s: %r", message_id, e,
+                exc_info=len(batch_errors) <= MAX_TRACEBACKS_PER_BATCH,
+            )
 
-    # Rollbacks during the loop expire all session objects; refresh before reading.
-    await session.refresh(job)
+    # Pass 3: write the batch's transactions
+    streak_updates = []
+    if parsed:
+        saved = await save_parsed_transactions(
+            session,
+            [(message_id, transaction, txn_date, "Unknown") for message_id, _, transaction, txn_date in parsed],
+            user_id,
+        )
 
-    # Apply batch stats to job once (caller commits)
+        for (message_id, subject, _, _), (row, error) in zip(parsed, saved):
+            if error is not None:
+                batch_failed += 1
+                batch_errors.append(_email_error(message_id, subject, error))
+                logger.warning(
+                    "Error processing email %s: %r", message_id, error,
+                    exc_info=error if len(batch_errors) <= MAX_TRACEBACKS_PER_BATCH else None,
+                )
+            elif row is None:
+                batch_skipped += 1
+                logger.debug(f"Duplicate transaction for message_id {message_id}, skipping")
+            else:
+                batch_parsed += 1
+                streak_updates.append(streak_update_item(row["id"], row["transactor_id"], row["type"]))
+
+    # Apply batch stats to job once
     job.parsed_transactions += batch_parsed
     job.failed_emails += batch_failed
     job.skipped_emails += batch_skipped
     job.processed_emails += batch_processed
     if batch_errors:
-        if job.error_log is None:
-            job.error_log = []
-        job.error_log.extend(batch_errors)
+        append_error_log(job, batch_errors)
+
+    if not parsed:
+        # Only progress counters changed; the caller decides when to commit them
+        return False
+
+    # Transactions and job stats are committed together
+    await session.commit()
+
+    # impl_2.md Task B: one batched task per email batch instead of a .delay() per email
+    await queue_streak_updates(user_id, streak_updates)
+    return True
+
+
+# Processing jobs older than this are assumed to belong to a dead worker
+STALE_JOB_THRESHOLD = timedelta(hours=2)
+
+
+async def fail_stale_email_sync_jobs(session) -> List:
+    """
+    Mark PROCESSING jobs older than STALE_JOB_THRESHOLD as FAILED (caller commits).
+
+    One UPDATE marks every stale job failed and appends to its error_log
+    server-side, instead of loading and rewriting each row.
+
+    Returns:
+        IDs of the jobs that were marked failed
+    """
+    now = datetime.now(timezone.utc)
+    stale_entry = [{
+        "timestamp": now.isoformat(),
+        "error": "Job marked stale (PROCESSING for >2 hours)",
+    }]
+    result = await session.execute(
+        update(EmailTransactionSyncJob)
+        .where(EmailTransactionSyncJob.status == JobStatus.PROCESSING)
+        .where(EmailTransactionSyncJob.started_at < now - STALE_JOB_THRESHOLD)
+        .values(
+            status=JobStatus.FAILED,
+            completed_at=now,
+            error_log=func.coalesce(
+                EmailTransactionSyncJob.error_log, literal([], JSONB)
+            ).op('||')(literal(stale_entry, JSONB)),
+        )
+        .returning(EmailTransactionSyncJob.id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalars().all()
 
 
 async def schedule_incremental_sync_async(fetch_user_emails_incremental_task):
     async with AsyncSessionLocal() as session:
-        users = (await session.execute(select(User))).scalars().all()
-        if not users:
-            return
-
-        tasks = []
-        for user in users:
-            if not user.google_token_pickle and not user.google_credentials_json:
-                continue
-
-            existing_job = (await session.execute(
-                select(EmailTransactionSyncJob).filter_by(user_id=user.id, status=JobStatus.PROCESSING)
-            )).scalars().first()
-
-            if existing_job:
-                logger.info(f"Skipping incremental sync for user {user.id}: job {existing_job.id} already processing")
-                continue
-
-            tasks.append(fetch_user_emails_incremental_task.s(str(user.id)))
+        # Free the slot held by jobs of dead workers first, so those users are
+        # synced in this run rather than after the next cleanup + beat
+        stale_job_ids = await fail_stale_email_sync_jobs(session)
+        if stale_job_ids:
+            await session.commit()
+            logger.warning(f"Marked stale email sync jobs as FAILED: {[str(job_id) for job_id in stale_job_ids]}")
 
-        if tasks:
-            from celery import group
-            group(tasks).apply_async()
+        # Two queries per beat instead of one job lookup per user: users with
+        # Gmail credentials, and every job currently processing
+        user_ids = (await session.execute(
+            select(User.id).where(
+                or_(User.google_token_pickle.isnot(None), User.google_credentials_json.isnot(None))
+            )
+        )).scalars().all()
+        if not user_ids:
+            return
 
-        logger.info(f"Scheduled incremental sync for {len(tasks)} users")
+        processing_jobs = (await session.execute(
+            select(EmailTransactionSyncJob.user_id, EmailTransactionSyncJob.id)
+            .where(EmailTransactionSyncJob.status == JobStatus.PROCESSING)
+        )).all()
+        # users.id is loaded as a string while job.user_id is a UUID: convert
+        # the (few) job keys once rather than every user id
+        in_progress = {str(job_user_id): job_id for job_user_id, job_id in processing_jobs}
+
+    # Dispatch after the session is closed so its connection goes back to the
+    # pool instead of being held while messages are published
+    tasks = []
+    for user_id in user_ids:
+        if user_id in in_progress:
+            logger.info(f"Skipping incremental sync for user {user_id}: job {in_progress[user_id]} already processing")
+            continue
+
+        tasks.append(fetch_user_emails_incremental_task.s(user_id))
+
+    if tasks:
+        from celery import group
+        group(tasks).apply_async()
+
+    logger.info(f"Scheduled incremental sync for {len(tasks)} users")
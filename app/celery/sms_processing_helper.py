@@ -3,45 +3,97 @@ SMS processing helper functions for Celery tasks.
 Contains core async logic for SMS transaction extraction and processing.
 """
 from celery.utils.log import get_task_logger
-from datetime import datetime
-from typing import List
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+import asyncio
+import uuid
 from sqlalchemy.future import select
-from sqlalchemy.exc import IntegrityError
 
 from app.celery.celery_db import CeleryAsyncSessionLocal as AsyncSessionLocal
-from app.services.transaction_handler import handle_new_transaction
+from app.celery.transaction_batch_helper import (
+    SELECT_EXISTING_MESSAGE_IDS,
+    append_error_log,
+    parse_transaction_date,
+    save_parsed_transactions,
+)
+from app.services.transaction_handler import streak_update_item, queue_streak_updates
+from app.config import settings
 from app.models.user import User
 from app.models.sms_transaction_sync_job import SmsTransactionSyncJob, JobStatus as SmsJobStatus
-from app.models.transaction import Transaction as DBTransaction
-from app.models.category import Category
-from app.models.transactor import Transactor
-from app.models.currency import Currency
-from app.models.account import Account
-from app.services.account_service import get_or_create_account
 from agent.coordinator import SmsProcessingCoordinator
 
 logger = get_task_logger(__name__)
 
+# SMS written and committed together; a chunk is one multi-row INSERT, with a
+# SAVEPOINT per SMS only when that INSERT fails
+SMS_COMMIT_CHUNK_SIZE = 50
 
-async def process_sms_batch_async(user_id: str, messages_data: List[dict]):
-    """Core async logic for SMS transaction batch processing"""
+
+@dataclass
+class _SmsChunkStats:
+    """Counts for one chunk, added to the job in one locked update"""
+    parsed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+
+class SmsBatchError(Exception):
+    """
+    An SMS batch failed part-way.
+
+    The first committed_messages messages were saved and counted in job
+    job_id, so a retry processes only the rest, against the same job.
+    """
+
+    def __init__(self, job_id: str, committed_messages: int, error: Exception):
+        super().__init__(str(error))
+        self.job_id = job_id
+        self.committed_messages = committed_messages
+
+
+async def process_sms_batch_async(
+    user_id: str,
+    messages_data: List[dict],
+    job_id: Optional[str] = None,
+    final_attempt: bool = True,
+):
+    """
+    Core async logic for SMS transaction batch processing.
+
+    job_id is the upload's sync job, shared by every task the upload was
+    split into; without it (tasks queued by older API versions) the batch
+    gets a job of its own. A failure raises SmsBatchError and marks the job
+    FAILED only on the final attempt; earlier attempts leave it to the retry.
+    """
     async with AsyncSessionLocal() as session:
-        # Get user
-        user = (await session.execute(select(User).filter_by(id=user_id))).scalar_one_or_none()
-        if not user:
+        # Only the user's existence is checked; skip loading the row
+        user_exists = (await session.execute(select(User.id).filter_by(id=user_id))).scalar()
+        if user_exists is None:
             logger.error(f"User {user_id} not found")
             return {"status": "error", "message": "User not found"}
         
-        # Create SMS transaction sync job
-        job = SmsTransactionSyncJob(
-            user_id=user_id,
-            status=SmsJobStatus.PROCESSING,
-            started_at=datetime.utcnow(),
-            total_sms=len(messages_data)
-        )
-        session.add(job)
+        if job_id is None:
+            job = SmsTransactionSyncJob(
+                user_id=user_id,
+                status=SmsJobStatus.PROCESSING,
+                started_at=datetime.now(timezone.utc),
+                total_sms=len(messages_data)
+            )
+            session.add(job)
+        else:
+            job = await session.get(SmsTransactionSyncJob, uuid.UUID(job_id), with_for_update=True)
+            if job is None:
+                logger.error(f"SMS sync job {job_id} not found")
+                return {"status": "error", "message": "Sync job not found"}
+            # The first of the upload's tasks to start marks the job as started
+            if job.status == SmsJobStatus.PENDING:
+                job.status = SmsJobStatus.PROCESSING
+                job.started_at = datetime.now(timezone.utc)
+        # All the job's defaults are client-side and commits don't expire it,
+        # so there is nothing to refresh afterwards
         await session.commit()
-        await session.refresh(job)
         
         try:
             # Initialize coordinator
@@ -49,27 +101,20 @@ async def process_sms_batch_async(user_id: str, messages_data: List[dict]):
             
             if not messages_data:
                 logger.info(f"No SMS transaction messages for user {user_id}")
-                job.status = SmsJobStatus.COMPLETED
-                job.completed_at = datetime.utcnow()
-                job.progress_percentage = 100.0
+                # Completes a job of its own; a shared job waits for its other tasks
+                await _add_chunk_stats(session, job, _SmsChunkStats())
                 await session.commit()
                 return {"status": "success", "message": "No SMS transaction messages"}
             
             logger.info(f"Processing {len(messages_data)} SMS transaction messages for user {user_id}")
             
-            # Process each SMS
+            # Process each SMS; the chunk that accounts for the upload's last
+            # message marks the job complete
             await process_sms_messages(session, messages_data, coordinator, user_id, job)
             
-            # Mark job complete
-            job.status = SmsJobStatus.COMPLETED
-            job.completed_at = datetime.utcnow()
-            job.progress_percentage = 100.0
-            
-            await session.commit()
-            
             logger.info(
-                f"✅ Completed SMS transaction sync for user {user_id}: "
-                f"{job.parsed_transactions} transactions parsed from {job.total_sms} SMS messages"
+                f"✅ Processed {len(messages_data)} SMS messages for user {user_id}: job {job.id} "
+                f"has {job.parsed_transactions} transactions parsed from {job.total_sms} SMS messages"
             )
             
             return {
@@ -82,12 +127,20 @@ async def process_sms_batch_async(user_id: str, messages_data: List[dict]):
         
         except Exception as e:
             logger.error(f"Error processing SMS transactions for user {user_id}: {e}", exc_info=True)
-            job.status = SmsJobStatus.FAILED
-            if job.error_log is None:
-                job.error_log = []
-            job.error_log.append({"timestamp": datetime.utcnow().isoformat(), "error": str(e)})
+            # The session may be mid-transaction (e.g. a failed chunk commit);
+            # reload the job's last committed state before recording the error,
+            # locked like the chunk updates of the upload's other tasks
+            await session.rollback()
+            await session.refresh(job, with_for_update=True)
+            if final_attempt:
+                job.status = SmsJobStatus.FAILED
+            append_error_log(job, [
+                {"timestamp": datetime.now(timezone.utc).isoformat(), "error": str(e)}
+            ])
             await session.commit()
-            raise
+            if isinstance(e, SmsBatchError):
+                raise
+            raise SmsBatchError(str(job.id), 0, e) from e
 
 
 async def process_sms_messages(
@@ -97,8 +150,97 @@ async def process_sms_messages(
     user_id: str, 
     job: SmsTransactionSyncJob
 ):
-    """Process a batch of SMS transaction messages using A2A coordination and save transactions"""
+    """
+    Process a batch of SMS transaction messages using A2A coordination and save transactions.
+
+    Raises SmsBatchError, counting the messages of the chunks committed
+    before the failure.
+    """
+    # SMS ids that already produced a transaction, found with one query for
+    # the batch before any message reaches the coordinator
+    seen_ids = set((await session.execute(
+        SELECT_EXISTING_MESSAGE_IDS,
+        {"message_ids": [msg_data["sms_id"] for msg_data in messages_data if msg_data.get("sms_id")]},
+    )).scalars().all())
+    # Stands in for the received time of messages that don't carry one
+    batch_received_at = datetime.now(timezone.utc)
     
+    for chunk_start in range(0, len(messages_data), SMS_COMMIT_CHUNK_SIZE):
+        streak_updates = []
+        try:
+            stats = await _process_sms_chunk(
+                session,
+                messages_data[chunk_start:chunk_start + SMS_COMMIT_CHUNK_SIZE],
+                coordinator,
+                user_id,
+                seen_ids,
+                batch_received_at,
+                streak_updates,
+            )
+            await _add_chunk_stats(session, job, stats)
+            # One commit per chunk persists its transactions and job progress
+            await session.commit()
+        except Exception as e:
+            raise SmsBatchError(str(job.id), chunk_start, e) from e
+        # Queued per committed chunk: a later chunk failing must not drop the
+        # streak updates of transactions already saved (a retry skips them)
+        await queue_streak_updates(user_id, streak_updates)
+    
+    logger.info(
+        f"✅ SMS transaction batch processing complete: {job.parsed_transactions} transactions, "
+        f"{job.failed_sms} failed, {job.skipped_sms} skipped"
+    )
+
+
+async def _add_chunk_stats(session, job: SmsTransactionSyncJob, stats: _SmsChunkStats) -> None:
+    """
+    Add one chunk's counts to job (caller commits).
+
+    The tasks of one upload share its job and may run at the same time, so
+    the row is re-read under a lock and incremented rather than overwritten.
+    """
+    await session.refresh(job, with_for_update=True)
+    job.parsed_transactions += stats.parsed
+    job.processed_sms += stats.parsed
+    job.failed_sms += stats.failed
+    job.skipped_sms += stats.skipped
+    if stats.errors:
+        append_error_log(job, stats.errors)
+    
+    # Every SMS ends up processed, failed or skipped
+    handled = job.processed_sms + job.failed_sms + job.skipped_sms
+    if job.total_sms:
+        job.progress_percentage = min(100.0, handled / job.total_sms * 100)
+    if handled >= job.total_sms and job.status == SmsJobStatus.PROCESSING:
+        job.status = SmsJobStatus.COMPLETED
+        job.completed_at = datetime.now(timezone.utc)
+        job.progress_percentage = 100.0
+
+
+def _record_sms_error(stats: _SmsChunkStats, sms_id, sender, error: Exception) -> None:
+    # Garbage SMS fail routinely: a warning per SMS, its traceback only when debugging
+    logger.warning("Error processing SMS %s: %r", sms_id, error)
+    logger.debug("Traceback for SMS %s", sms_id, exc_info=error)
+    stats.failed += 1
+    stats.errors.append({
+        "sms_id": sms_id,
+        "sender": sender,
+        "error": str(error)
+    })
+
+
+async def _process_sms_chunk(
+    session,
+    messages_data: List[dict],
+    coordinator: SmsProcessingCoordinator,
+    user_id: str,
+    seen_ids: Set[str],
+    batch_received_at: datetime,
+    streak_updates: List[dict],
+) -> _SmsChunkStats:
+    """Parse one chunk of SMS messages and write its transactions (caller commits)"""
+    stats = _SmsChunkStats()
+    candidates = []
     for msg_data in messages_data:
         sms_id = None
         sender = None
@@ -110,27 +252,54 @@ async def process_sms_messages(
             sender = msg_data["sender"]
             timestamp_str = msg_data.get("timestamp")
             
-            # Parse timestamp
+            # Duplicate sms_id (reuse message_id field): already saved, or
+            # repeated earlier in this batch
+            if sms_id in seen_ids:
+                stats.skipped += 1
+                logger.debug(f"Skipping duplicate transaction for sms_id: {sms_id}")
+                continue
+            seen_ids.add(sms_id)
+            
+            # Parse timestamp (fromisoformat accepts a trailing 'Z' on 3.11+)
             timestamp = None
             if timestamp_str:
                 try:
-                    timestamp = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
+                    timestamp = datetime.fromisoformat(timestamp_str)
                 except Exception:
-                    timestamp = datetime.utcnow()
+                    timestamp = batch_received_at
             else:
-                timestamp = datetime.utcnow()
+                timestamp = batch_received_at
+            
+            candidates.append((sms_id, body, sender, timestamp))
             
-            # Process SMS with A2A coordination
-            result = coordinator.process_sms(
+        except Exception as e:
+            _record_sms_error(stats, sms_id, sender, e)
+    
+    # The coordinator needs no DB access and may wait on the LLM, so the
+    # chunk's SMS are parsed concurrently in worker threads
+    semaphore = asyncio.Semaphore(settings.SMS_PARSE_CONCURRENCY)
+    
+    async def parse(sms_id, body, sender, timestamp):
+        async with semaphore:
+            return await asyncio.to_thread(
+                coordinator.process_sms,
                 sms_id=sms_id,
                 sms_body=body,
                 sender=sender,
                 timestamp=timestamp
             )
+    
+    results = await asyncio.gather(*(parse(*item) for item in candidates), return_exceptions=True)
+    
+    parsed = []
+    for (sms_id, body, sender, _), result in zip(candidates, results):
+        try:
+            if isinstance(result, BaseException):
+                raise result
             
             # Check if SMS was processed
             if not result.processed:
-                job.skipped_sms += 1
+                stats.skipped += 1
                 logger.info(f"Skipped SMS from {sender}: {body[:50]}... - Reason: {result.skip_reason}")
                 continue
             
@@ -138,140 +307,40 @@ async def process_sms_messages(
             transaction = result.transaction
             
             if not transaction:
-                job.failed_sms += 1
+                stats.failed += 1
                 logger.warning(f"Failed to extract transaction from SMS: {body[:50]}...")
                 continue
             
-            # Check for duplicate by sms_id (reuse message_id field)
-            existing = (await session.execute(
-                select(DBTransaction).filter_by(message_id=sms_id)
-            )).scalar_one_or_none()
-            
-            if existing:
-                logger.debug(f"Skipping duplicate transaction for sms_id: {sms_id}")
-                continue
-            
-            # Get or create Category
-            category = (await session.execute(
-                select(Category).filter_by(label=transaction.category)
-            )).scalar_one_or_none()
-            
-            if not category:
-                category = Category(label=transaction.category)
-                session.add(category)
-                await session.flush()
-            
-            # Get or create Transactor
-            transactor = None
-            if transaction.transactor_source_id:
-                transactor = (await session.execute(
-                    select(Transactor).filter_by(
-                        source_id=transaction.transactor_source_id, 
-                        user_id=user_id
-                    )
-                )).scalar_one_or_none()
-            
-            if not transactor and transaction.transactor:
-                transactor = (await session.execute(
-                    select(Transactor).filter_by(
-                        name=transaction.transactor, 
-                        user_id=user_id
-                    )
-                )).scalar_one_or_none()
-            
-            if not transactor:
-                transactor = Transactor(
-                    name=transaction.transactor or sender or "Unknown",
-                    source_id=transaction.transactor_source_id,
-                    user_id=user_id
-                )
-                session.add(transactor)
-                await session.flush()
-            elif transaction.transactor_source_id and not transactor.source_id:
-                transactor.source_id = transaction.transactor_source_id
-                await session.flush()
-            
-            # Get Currency (default INR)
-            currency = (await session.execute(
-                select(Currency).filter_by(value="INR")
-            )).scalar_one_or_none()
-            
-            if not currency:
-                currency = Currency(name="Indian Rupee", value="INR", country="India")
-                session.add(currency)
-                await session.flush()
-            
-            # Get or create Account from transaction data (already extracted by coordinator)
-            account = None
-            if transaction.account_last_four:
-                account = await get_or_create_account(
-                    session=session,
-                    user_id=user_id,
-                    account_last_four=transaction.account_last_four,
-                    bank_name=transaction.bank_name or "Unknown",
-                    account_type=getattr(transaction, 'account_type', 'savings')
-                )
-            
-            # Create transaction
-            db_transaction = DBTransaction(
-                amount=transaction.amount,
-                type=transaction.transaction_type.value,
-                date=datetime.strptime(transaction.date, "%Y-%m-%d %H:%M:%S"),
-                description=transaction.description,
-                confidence=str(transaction.confidence),
-                user_id=user_id,
-                category_id=category.id,
-                transactor_id=transactor.id,
-                currency_id=currency.id,
-                message_id=sms_id,  # Store SMS ID in message_id field
-                account_id=account.id if account else None
-            )
-            session.add(db_transaction)
+            txn_date = parse_transaction_date(transaction.date)
+            parsed.append((sms_id, sender, transaction, txn_date))
             
-            # Commit immediately after each transaction
-            await session.commit()
-            
-            # impl_2.md Task B: Queue streak update on every new transaction
-            await handle_new_transaction(db_transaction)
-            
-            job.parsed_transactions += 1
+        except Exception as e:
+            _record_sms_error(stats, sms_id, sender, e)
+    
+    if not parsed:
+        return stats
+    
+    # New transactors are named after the sender when the extractor found none
+    saved = await save_parsed_transactions(
+        session,
+        [(sms_id, transaction, txn_date, sender or "Unknown") for sms_id, sender, transaction, txn_date in parsed],
+        user_id,
+    )
+    
+    for (sms_id, sender, transaction, _), (row, error) in zip(parsed, saved):
+        if error is not None:
+            _record_sms_error(stats, sms_id, sender, error)
+        elif row is None:
+            # Saved concurrently by another task since the dedupe query
+            stats.skipped += 1
+            logger.debug(f"Skipping duplicate transaction for sms_id {sms_id}")
+        else:
+            # impl_2.md Task B: collected here, queued as one batched task once the chunk commits
+            streak_updates.append(streak_update_item(row["id"], row["transactor_id"], row["type"]))
+            stats.parsed += 1
             logger.info(
-                f"✓ Committed SMS transaction: {transaction.amount} {transaction.transaction_type.value} "
+                f"✓ Saved SMS transaction: {transaction.amount} {transaction.transaction_type.value} "
                 f"- {transaction.description[:50]}"
             )
-            
-        except IntegrityError as e:
-            # Duplicate sms_id - this SMS was already processed
-            await session.rollback()
-            logger.debug(f"Skipping duplicate transaction for sms_id {sms_id}")
-            continue
-            
-        except Exception as e:
-            # Any other error - rollback and continue with next SMS
-            await session.rollback()
-            logger.error(f"Error processing SMS {sms_id}: {e}", exc_info=True)
-            job.failed_sms += 1
-            if job.error_log is None:
-                job.error_log = []
-            job.error_log.append({
-                "sms_id": sms_id,
-                "sender": sender,
-                "error": str(e)
-            })
-            continue
-        
-        # Update progress
-        job.processed_sms += 1
-        job.progress_percentage = (job.processed_sms / job.total_sms) * 100
-        await session.commit()
     
-    # Final commit for job progress updates
-    try:
-        await session.commit()
-        logger.info(
-            f"✅ SMS transaction batch processing complete: {job.parsed_transactions} transactions, "
-            f"{job.failed_sms} failed, {job.skipped_sms} skipped"
-        )
-    except Exception as e:
-        logger.error(f"Failed to commit final SMS transaction job progress: {e}", exc_info=True)
-        await session.rollback()
+    return stats
@@ -0,0 +1,261 @@
+"""
+Batch persistence shared by the email and SMS sync helpers.
+Resolves the categories, transactors and accounts a batch of parsed
+transactions references with one query per entity type, and writes the
+transactions with a single INSERT ... ON CONFLICT (message_id) DO NOTHING.
+"""
+from celery.utils.log import get_task_logger
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List
+import uuid
+
+from sqlalchemy import bindparam, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.future import select
+
+from app.models.transaction import Transaction as DBTransaction
+from app.models.category import Category
+from app.models.transactor import Transactor
+from app.models.account import Account, AccountType
+from app.services.account_service import update_account_details
+from app.services.currency_service import get_or_create_currency_id
+
+logger = get_task_logger(__name__)
+
+# Most recent entries kept in a sync job's error_log, so a sync that fails on
+# every message doesn't grow the JSONB row (rewritten on each update) without bound
+MAX_ERROR_LOG_ENTRIES = 100
+
+
+@dataclass
+class BatchLookups:
+    """Rows resolved once per batch, keyed the way parsed transactions look them up."""
+    currency_id: str
+    categories: Dict[str, Category]
+    transactors_by_source: Dict[str, Transactor]
+    transactors_by_name: Dict[str, Transactor]
+    accounts: Dict[str, Account]
+
+
+# Per-batch lookups, built once at import instead of per batch; the IN lists
+# are expanding bind parameters supplied at execution time
+SELECT_EXISTING_MESSAGE_IDS = select(DBTransaction.message_id).where(
+    DBTransaction.message_id.in_(bindparam("message_ids", expanding=True))
+)
+_SELECT_CATEGORIES_BY_LABEL = select(Category).where(
+    Category.label.in_(bindparam("labels", expanding=True))
+)
+_SELECT_USER_ACCOUNTS = select(Account).where(
+    Account.user_id == bindparam("user_id"),
+    Account.account_last_four.in_(bindparam("last_fours", expanding=True)),
+)
+_SELECT_USER_TRANSACTORS = select(Transactor).where(
+    Transactor.user_id == bindparam("user_id"),
+    or_(
+        Transactor.source_id.in_(bindparam("source_ids", expanding=True)),
+        Transactor.name.in_(bindparam("names", expanding=True)),
+    ),
+)
+
+
+def parse_transaction_date(value: str) -> datetime:
+    """Parse the date of a transaction returned by the extractors."""
+    # The extractor normalizes dates to "YYYY-MM-DD HH:MM:SS", which the
+    # C-implemented fromisoformat parses far faster than strptime
+    return datetime.fromisoformat(value)
+
+
+def append_error_log(job, entries: List[dict]) -> None:
+    """Add entries to a sync job's error_log, keeping the last MAX_ERROR_LOG_ENTRIES."""
+    # Reassign rather than extend: the JSONB column doesn't track in-place changes
+    job.error_log = ((job.error_log or []) + entries)[-MAX_ERROR_LOG_ENTRIES:]
+
+
+async def load_batch_lookups(session, user_id: str, transactions: List) -> BatchLookups:
+    """Fetch every category/transactor/account the batch references with one query per entity type."""
+    labels = {t.category for t in transactions if t.category}
+    categories = {}
+    if labels:
+        for category in (await session.execute(
+            _SELECT_CATEGORIES_BY_LABEL, {"labels": list(labels)}
+        )).scalars():
+            categories.setdefault(category.label, category)
+
+    source_ids = {t.transactor_source_id for t in transactions if t.transactor_source_id}
+    names = {t.transactor for t in transactions if t.transactor}
+    by_source, by_name = {}, {}
+    if source_ids or names:
+        for transactor in (await session.execute(
+            _SELECT_USER_TRANSACTORS,
+            {"user_id": user_id, "source_ids": list(source_ids), "names": list(names)},
+        )).scalars():
+            if transactor.source_id:
+                by_source.setdefault(transactor.source_id, transactor)
+            by_name.setdefault(transactor.name, transactor)
+
+    last_fours = {t.account_last_four for t in transactions if t.account_last_four}
+    accounts = {}
+    if last_fours:
+        for account in (await session.execute(
+            _SELECT_USER_ACCOUNTS, {"user_id": user_id, "last_fours": list(last_fours)}
+        )).scalars():
+            accounts.setdefault(account.account_last_four, account)
+
+    return BatchLookups(
+        currency_id=await get_or_create_currency_id(session),
+        categories=categories,
+        transactors_by_source=by_source,
+        transactors_by_name=by_name,
+        accounts=accounts,
+    )
+
+
+def stage_transaction(
+    session,
+    user_id: str,
+    message_id: str,
+    transaction,
+    txn_date: datetime,
+    lookups: BatchLookups,
+    default_transactor_name: str = "Unknown",
+) -> dict:
+    """
+    Build the transaction row for one parsed message, adding any missing
+    category/transactor/account to the session (written by the next flush).
+
+    default_transactor_name names a new transactor when the extractor found
+    none (e.g. the SMS sender).
+    """
+    # Category
+    category = lookups.categories.get(transaction.category)
+    if not category:
+        category = Category(id=str(uuid.uuid4()), label=transaction.category)
+        session.add(category)
+        lookups.categories[transaction.category] = category
+
+    # Transactor
+    transactor = None
+    if transaction.transactor_source_id:
+        transactor = lookups.transactors_by_source.get(transaction.transactor_source_id)
+    if not transactor and transaction.transactor:
+        transactor = lookups.transactors_by_name.get(transaction.transactor)
+    if not transactor:
+        transactor = Transactor(
+            id=str(uuid.uuid4()),
+            name=transaction.transactor or default_transactor_name,
+            source_id=transaction.transactor_source_id,
+            user_id=user_id
+        )
+        session.add(transactor)
+        if transaction.transactor_source_id:
+            lookups.transactors_by_source[transaction.transactor_source_id] = transactor
+        if transaction.transactor:
+            lookups.transactors_by_name[transaction.transactor] = transactor
+    elif transaction.transactor_source_id and not transactor.source_id:
+        transactor.source_id = transaction.transactor_source_id
+        lookups.transactors_by_source[transaction.transactor_source_id] = transactor
+
+    # Account (matched by last four digits, created once per batch)
+    account = None
+    if transaction.account_last_four:
+        account_type = getattr(transaction, 'account_type', 'savings')
+        bank_name = transaction.bank_name or "Unknown"
+        account = lookups.accounts.get(transaction.account_last_four)
+        if account is None:
+            account = Account(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                account_last_four=transaction.account_last_four,
+                bank_name=bank_name,
+                type=AccountType(account_type)
+            )
+            session.add(account)
+            lookups.accounts[transaction.account_last_four] = account
+        else:
+            update_account_details(account, bank_name, account_type)
+
+    return {
+        "id": str(uuid.uuid4()),
+        "amount": transaction.amount,
+        "type": transaction.transaction_type.value,
+        "date": txn_date,
+        "description": transaction.description,
+        "confidence": str(transaction.confidence),
+        "user_id": user_id,
+        "category_id": category.id,
+        "transactor_id": transactor.id,
+        "currency_id": lookups.currency_id,
+        "message_id": message_id,
+        "account_id": account.id if account else None,
+    }
+
+
+async def insert_transactions(session, rows: List[dict]) -> set:
+    """
+    Insert transaction rows with one statement, skipping message_ids that
+    already exist. Returns the ids of the rows actually inserted.
+    """
+    # New categories/transactors/accounts must exist before the FKs that use them
+    await session.flush()
+    result = await session.execute(
+        pg_insert(DBTransaction)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=['message_id'])
+        .returning(DBTransaction.id)
+    )
+    return set(result.scalars().all())
+
+
+async def save_parsed_transactions(session, parsed: List, user_id: str, *, isolate_rows: bool = False) -> List:
+    """
+    Write the transactions for a batch of parsed messages (caller commits).
+
+    The batch is written as one INSERT inside a SAVEPOINT. If that fails,
+    only the savepoint is rolled back and each message is retried in its own
+    SAVEPOINT so one bad row doesn't sink the rest; isolate_rows goes
+    straight to the per-message writes.
+
+    Args:
+        parsed: (message_id, transaction, txn_date, default_transactor_name)
+                tuples, see stage_transaction
+
+    Returns:
+        One (row, error) pair per parsed message, in order: row is None for
+        messages whose message_id was already stored or that failed, and
+        error is the exception a message failed with
+    """
+    if not isolate_rows:
+        try:
+            async with session.begin_nested():
+                lookups = await load_batch_lookups(session, user_id, [item[1] for item in parsed])
+                rows = [
+                    stage_transaction(
+                        session, user_id, message_id, transaction, txn_date, lookups,
+                        default_transactor_name=default_transactor_name,
+                    )
+                    for message_id, transaction, txn_date, default_transactor_name in parsed
+                ]
+                inserted = await insert_transactions(session, rows)
+            return [(row if row["id"] in inserted else None, None) for row in rows]
+        except Exception as e:
+            logger.warning(f"Batch insert failed for user {user_id}, retrying messages individually: {e}")
+
+    # Objects staged in a rolled-back savepoint are gone, so the lookups are
+    # loaded afresh here and again after every failed message
+    lookups = await load_batch_lookups(session, user_id, [item[1] for item in parsed])
+    results = []
+    for message_id, transaction, txn_date, default_transactor_name in parsed:
+        try:
+            async with session.begin_nested():
+                row = stage_transaction(
+                    session, user_id, message_id, transaction, txn_date, lookups,
+                    default_transactor_name=default_transactor_name,
+                )
+                inserted = await insert_transactions(session, [row])
+            results.append((row if inserted else None, None))
+        except Exception as e:
+            results.append((None, e))
+            lookups = await load_batch_lookups(session, user_id, [item[1] for item in parsed])
+
+    return results
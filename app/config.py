@@ -7,6 +7,12 @@ import os
 class Settings(BaseSettings):
     # Database Configuration
     DATABASE_URL: str = os.getenv("DATABASE_URL", "postgresql://postgres:root@db/postgres")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE_SECONDS: int = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "500"))
+    CELERY_DB_POOL_SIZE: int = int(os.getenv("CELERY_DB_POOL_SIZE", "2"))
+    CELERY_DB_MAX_OVERFLOW: int = int(os.getenv("CELERY_DB_MAX_OVERFLOW", "3"))
     
     # Logging Configuration
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -36,9 +42,17 @@ class Settings(BaseSettings):
     # Email Configuration
     EMAIL_FETCH_DAYS: int = int(os.getenv("EMAIL_FETCH_DAYS", "90"))
     EMAIL_FETCH_ASCENDING: bool = os.getenv("EMAIL_FETCH_ASCENDING", "False").lower() == "true"
+    EMAIL_SENDER_ALLOWLIST: str = os.getenv("EMAIL_SENDER_ALLOWLIST", "")
+    EMAIL_EXCLUDED_CATEGORIES: str = os.getenv("EMAIL_EXCLUDED_CATEGORIES", "")
+    EMAIL_PARSE_CONCURRENCY: int = int(os.getenv("EMAIL_PARSE_CONCURRENCY", "8"))
+
+    # SMS Configuration
+    SMS_PARSE_CONCURRENCY: int = int(os.getenv("SMS_PARSE_CONCURRENCY", "8"))
+    SMS_TASK_MAX_MESSAGES: int = int(os.getenv("SMS_TASK_MAX_MESSAGES", "500"))
 
     # Spending Analysis Configuration
     SPENDING_ANALYSIS_IN_DAYS: int = int(os.getenv("SPENDING_ANALYSIS_IN_DAYS", "90"))
+    PATTERN_NEGATIVE_CACHE_TTL_SECONDS: int = int(os.getenv("PATTERN_NEGATIVE_CACHE_TTL_SECONDS", "300"))
 
     # Celery Configuration
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
@@ -1,9 +1,7 @@
 import asyncio
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.pool import QueuePool
-from databases import Database
 
 from app.config import settings
 from app.logging_config import get_logger
@@ -13,20 +11,24 @@ logger = get_logger(__name__)
 # SQLAlchemy Base for models
 Base = declarative_base()
 
-# SQLAlchemy engine with connection pooling (for migrations)
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=QueuePool,
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    echo=False
-)
+# asyncpg connection options, shared with the Celery engine (celery_db.py)
+ASYNCPG_CONNECT_ARGS = {
+    "prepared_statement_cache_size": settings.DB_PREPARED_STATEMENT_CACHE_SIZE,
+    # Our queries are short OLTP lookups; JIT compilation only adds
+    # startup latency to them (and to asyncpg's type introspection)
+    "server_settings": {"jit": "off"},
+}
 
-# Async SQLAlchemy engine for ORM operations
+# Async SQLAlchemy engine: the API's only connection pool (migrations connect
+# through alembic/env.py). asyncpg keeps a per-connection prepared statement
+# cache, so repeated queries skip Postgres parse/plan.
 async_engine = create_async_engine(
     settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://"),
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
     pool_pre_ping=True,
+    connect_args=ASYNCPG_CONNECT_ARGS,
     echo=False
 )
 
@@ -37,18 +39,12 @@ AsyncSessionLocal = async_sessionmaker(
     expire_on_commit=False
 )
 
-# Async database instance for FastAPI (for raw queries if needed)
-database = Database(
-    settings.DATABASE_URL,
-    min_size=5,
-    max_size=20
-)
-
 
 async def check_database_connection() -> bool:
     """Check if database connection is healthy"""
     try:
-        await database.fetch_one("SELECT 1")
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
         return True
     except Exception as e:
         logger.error(f"Database connection check failed: {e}")
@@ -59,7 +55,8 @@ async def connect_with_retry(max_retries: int = 3, delay: float = 1.0):
     """Connect to database with retry logic"""
     for attempt in range(max_retries):
         try:
-            await database.connect()
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
             logger.info("Database connected successfully")
             return True
         except Exception as e:
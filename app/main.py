@@ -4,7 +4,7 @@ from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.config import settings
-from app.db import database
+from app.db import async_engine
 from app.exceptions import AppException
 from app.routes import api_router
 from app.logging_config import setup_logging, get_logger
@@ -25,7 +25,7 @@ async def lifespan(app: FastAPI):
         yield
     finally:
         logger.info("Shutting down...")
-        await database.disconnect()
+        await async_engine.dispose()
 
 
 app = FastAPI(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, DateTime, Enum as SQLEnum, Boolean
+from sqlalchemy import Column, Integer, DateTime, Enum as SQLEnum, Boolean, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from datetime import datetime, timezone
 import uuid
@@ -17,9 +17,22 @@ class JobStatus(str, enum.Enum):
 
 class EmailTransactionSyncJob(Base):
     __tablename__ = "email_transaction_sync_jobs"
+    __table_args__ = (
+        # At most one processing job per user (created in migration 011,
+        # before the table was renamed)
+        Index(
+            'uq_transaction_sync_jobs_user_processing',
+            'user_id',
+            unique=True,
+            postgresql_where=text("status = 'processing'"),
+        ),
+        # A user's jobs newest first (status and history endpoints); also
+        # serves plain user_id lookups
+        Index('ix_email_transaction_sync_jobs_user_created_at', 'user_id', 'created_at'),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    user_id = Column(UUID(as_uuid=True), nullable=False)
     status = Column(
         SQLEnum(JobStatus, name='jobstatus', values_callable=lambda enum_cls: [e.value for e in enum_cls]),
         default=JobStatus.PROCESSING,
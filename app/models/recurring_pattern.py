@@ -94,7 +94,6 @@ class RecurringPattern(Base):
         Index('uq_recurring_patterns_user_transactor_direction', 'user_id', 'transactor_id', 'direction', unique=True),
         Index('ix_recurring_patterns_user_status', 'user_id', 'status'),
         Index('ix_recurring_patterns_user_pattern_type', 'user_id', 'pattern_type'),
-        Index('ix_recurring_patterns_user_transactor_direction', 'user_id', 'transactor_id', 'direction'),
     )
     
     def __repr__(self):
@@ -35,7 +35,7 @@ class SmsTransactionSyncJob(Base):
     processed_sms = Column(Integer, default=0, nullable=False)
     parsed_transactions = Column(Integer, default=0, nullable=False)
     failed_sms = Column(Integer, default=0, nullable=False)
-    skipped_sms = Column(Integer, default=0, nullable=False)  # SMS filtered by intent classifier
+    skipped_sms = Column(Integer, default=0, nullable=False)  # SMS filtered by intent classifier or already imported
     progress_percentage = Column(Float, default=0.0, nullable=False)
     error_log = Column(JSONB, default=list, nullable=False)
     started_at = Column(DateTime(timezone=True), nullable=True)
@@ -21,6 +21,7 @@ class User(Base):
     google_token_pickle = Column(LargeBinary, nullable=True)
     currency_id = Column(UUID(as_uuid=False), ForeignKey('currencies.id', ondelete='SET NULL'), nullable=True, index=True)
     last_email_fetch_time = Column(DateTime(timezone=True), nullable=True)
+    last_history_id = Column(String, nullable=True)  # Gmail historyId at the last completed sync
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
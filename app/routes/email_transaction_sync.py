@@ -53,6 +53,7 @@ async def get_email_transaction_sync_status(
         select(EmailTransactionSyncJob)
         .filter_by(user_id=user_id)
         .order_by(EmailTransactionSyncJob.created_at.desc())
+        .limit(1)
     )).scalar_one_or_none()
 
     if not job:
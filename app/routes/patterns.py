@@ -8,6 +8,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+import asyncio
 from pydantic import BaseModel, Field
 import uuid
 from datetime import datetime, timedelta
@@ -23,6 +24,7 @@ from app.models.recurring_pattern import RecurringPattern
 from app.models.recurring_pattern_streak import RecurringPatternStreak
 from app.models.pattern_obligation import PatternObligation
 from app.services.pattern_service import PatternService
+from app.services.pattern_cache import clear_no_pattern_cache
 
 
 router = APIRouter(prefix="/patterns", tags=["patterns"])
@@ -406,6 +408,9 @@ async def update_pattern(
         pattern.last_evaluated_at = datetime.utcnow()
 
     await db.commit()
+    if request.status in ('ACTIVE', 'PAUSED'):
+        # The pattern is matched against new transactions again
+        await asyncio.to_thread(clear_no_pattern_cache, str(current_user.id))
 
     return {
         "status": "success",
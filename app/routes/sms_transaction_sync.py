@@ -13,7 +13,8 @@ from app.db import get_db_session
 from app.models.user_permission import UserPermission, PermissionType
 from app.models.sms_transaction_sync_job import SmsTransactionSyncJob, JobStatus
 from app.models.user import User
-from app.celery.celery_tasks import process_sms_batch_task
+from app.celery.celery_tasks import enqueue_sms_batches
+from app.config import settings
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -239,14 +240,30 @@ async def upload_sms_batch(
         for msg in batch.messages
     ]
     
-    # Queue the task
-    task = process_sms_batch_task.delay(user_id, messages_data)
+    # One sync job per upload; the tasks below all add their counts to it
+    job = SmsTransactionSyncJob(
+        user_id=user_id,
+        status=JobStatus.PENDING,
+        total_sms=len(messages_data)
+    )
+    session.add(job)
+    await session.commit()
     
-    logger.info(f"Started SMS transaction batch processing for user {user_id} ({len(batch.messages)} messages, task_id: {task.id})")
+    # Queue the tasks: large uploads are split so no single broker message or
+    # worker holds the whole upload
+    chunk_size = max(1, settings.SMS_TASK_MAX_MESSAGES)
+    task_ids = enqueue_sms_batches([
+        (user_id, messages_data[i:i + chunk_size], str(job.id))
+        for i in range(0, len(messages_data), chunk_size)
+    ])
+    
+    logger.info(f"Started SMS transaction batch processing for user {user_id} ({len(batch.messages)} messages, job {job.id}, task_ids: {task_ids})")
     
     return {
         "message": "SMS transaction batch processing started",
-        "task_id": task.id,
+        "job_id": str(job.id),
+        "task_id": task_ids[0],
+        "task_ids": task_ids,
         "user_id": user_id,
         "sms_count": len(batch.messages)
     }
@@ -271,6 +288,7 @@ async def get_sms_transaction_sync_status(
         select(SmsTransactionSyncJob)
         .filter_by(user_id=user_id)
         .order_by(SmsTransactionSyncJob.created_at.desc())
+        .limit(1)
     )).scalar_one_or_none()
     
     if not job:
@@ -1,63 +1,24 @@
 """
 Account Service
-Handles account creation and retrieval operations.
+Keeps stored accounts up to date with details from parsed messages.
 """
-from typing import Optional
-from sqlalchemy.future import select
-from sqlalchemy.ext.asyncio import AsyncSession
-
 from app.models.account import Account, AccountType
 
 
-async def get_or_create_account(
-    session: AsyncSession,
-    user_id: str,
-    account_last_four: str,
-    bank_name: str,
-    account_type: str = "savings"
-) -> Account:
+def update_account_details(account: Account, bank_name: str, account_type: str) -> None:
     """
-    Get or create an account based on user_id and account_last_four.
+    Refresh an existing account with details from a newly parsed message.
     
     Args:
-        session: SQLAlchemy async session
-        user_id: UUID string of the user
-        account_last_four: Last 4 digits of the account number
-        bank_name: Name of the bank
-        account_type: Type of account (credit, savings, current)
-        
-    Returns:
-        Account: The existing or newly created account
+        account: Account matched by user_id and account_last_four
+        bank_name: Name of the bank from the message
+        account_type: Type of account from the message (credit, savings, current)
     """
-    # Try to find existing account
-    existing_account = (await session.execute(
-        select(Account).filter_by(
-            user_id=user_id,
-            account_last_four=account_last_four
-        )
-    )).scalar_one_or_none()
-    
-    if existing_account:
-        # Update bank name if it was not set or if new one is more specific
-        if not existing_account.bank_name or existing_account.bank_name == "Unknown":
-            existing_account.bank_name = bank_name
-        
-        # Update account type if different (e.g., upgraded from savings to credit)
-        type_enum = AccountType(account_type)
-        if existing_account.type != type_enum:
-            existing_account.type = type_enum
-        
-        await session.flush()
-        return existing_account
-    
-    # Create new account
-    new_account = Account(
-        user_id=user_id,
-        account_last_four=account_last_four,
-        bank_name=bank_name,
-        type=AccountType(account_type)
-    )
-    session.add(new_account)
-    await session.flush()
+    # Update bank name if it was not set or if new one is more specific
+    if not account.bank_name or account.bank_name == "Unknown":
+        account.bank_name = bank_name
     
-    return new_account
+    # Update account type if different (e.g., upgraded from savings to credit)
+    type_enum = AccountType(account_type)
+    if account.type != type_enum:
+        account.type = type_enum
@@ -0,0 +1,53 @@
+"""
+Currency Service
+Resolves currency rows for transaction ingestion.
+"""
+from typing import Dict
+import uuid
+
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.currency import Currency
+
+DEFAULT_CURRENCY = {"name": "Indian Rupee", "value": "INR", "country": "India"}
+
+# Process-local cache of currency code -> id. Currency rows are effectively
+# static, so each worker looks them up once instead of once per message.
+_currency_ids: Dict[str, str] = {}
+
+
+async def get_or_create_currency_id(session: AsyncSession, value: str = DEFAULT_CURRENCY["value"]) -> str:
+    """
+    Get the id of the currency with the given code, creating the default
+    currency if it does not exist yet.
+    
+    Args:
+        session: SQLAlchemy async session
+        value: Currency code (e.g., INR)
+        
+    Returns:
+        str: The currency id
+    """
+    currency_id = _currency_ids.get(value)
+    if currency_id:
+        return currency_id
+
+    # Only the primary key is needed; skip hydrating a Currency row
+    currency_id = (await session.execute(
+        select(Currency.id).filter_by(value=value)
+    )).scalar()
+
+    if currency_id:
+        _currency_ids[value] = currency_id
+        return currency_id
+
+    # Not cached until committed: a rollback would leave a dangling id behind
+    currency = Currency(id=str(uuid.uuid4()), **{**DEFAULT_CURRENCY, "value": value})
+    session.add(currency)
+    return currency.id
+
+
+def invalidate_currency_cache() -> None:
+    """Forget cached currency ids (e.g., after currencies are edited or deleted)."""
+    _currency_ids.clear()
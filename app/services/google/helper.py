@@ -5,6 +5,14 @@ from app.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Retries per Gmail API request; googleapiclient backs off exponentially with
+# jitter on 429s, 5xx responses and rate-limit 403s
+GMAIL_NUM_RETRIES = 5
+
+# messages.get calls per batch HTTP request (Gmail advises at most 50 to
+# avoid rate limiting the parts)
+GMAIL_BATCH_SIZE = 50
+
 
 def fetch_messages_paginated(service, query: str, max_results: Optional[int]) -> List[dict]:
     """
@@ -29,7 +37,7 @@ def fetch_messages_paginated(service, query: str, max_results: Optional[int]) ->
             q=query,
             maxResults=results_per_page,
             pageToken=page_token
-        ).execute()
+        ).execute(num_retries=GMAIL_NUM_RETRIES)
         
         # Collect messages from this page
         page_messages = response.get('messages', [])
@@ -44,13 +52,56 @@ def fetch_messages_paginated(service, query: str, max_results: Optional[int]) ->
     return messages
 
 
-def get_email_content(service, message_id: str) -> Optional[Tuple[str, str, str, datetime, str]]:
+def fetch_history_message_ids(service, start_history_id: str) -> List[str]:
+    """
+    Fetch IDs of messages added to the mailbox since a history ID.
+    
+    Args:
+        service: Gmail API service instance
+        start_history_id: historyId returned by an earlier getProfile call
+    
+    Returns:
+        List of added message IDs, oldest first, without duplicates
+    
+    Raises:
+        googleapiclient.errors.HttpError: 404 if start_history_id has expired
+    """
+    message_ids = []
+    seen_ids = set()
+    page_token = None
+    
+    while True:
+        response = service.users().history().list(
+            userId='me',
+            startHistoryId=start_history_id,
+            historyTypes=['messageAdded'],
+            maxResults=500,
+            pageToken=page_token
+        ).execute(num_retries=GMAIL_NUM_RETRIES)
+        
+        for record in response.get('history', []):
+            for added in record.get('messagesAdded', []):
+                message_id = added.get('message', {}).get('id')
+                if message_id and message_id not in seen_ids:
+                    seen_ids.add(message_id)
+                    message_ids.append(message_id)
+        
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            break
+    
+    return message_ids
+
+
+def get_email_content(service, message_id: str, http=None) -> Optional[Tuple[str, str, str, datetime, str]]:
     """
     Get full email content from Gmail message ID.
     
     Args:
         service: Gmail API service instance
         message_id: Gmail message ID
+        http: Optional authorized HTTP client to execute the request with
+              (required when calling from multiple threads)
     
     Returns:
         Tuple of (message_id, subject, body, date, sender_email) or None
@@ -61,56 +112,116 @@ def get_email_content(service, message_id: str) -> Optional[Tuple[str, str, str,
             userId='me',
             id=message_id,
             format='full'
-        ).execute()
-        
-        headers = message['payload']['headers']
-        
-        # Extract subject from headers
-        subject = next(
-            (h['value'] for h in headers if h['name'] == 'Subject'), 
-            'No Subject'
-        )
+        ).execute(http=http, num_retries=GMAIL_NUM_RETRIES)
         
-        # Extract sender email from From header
-        sender = next(
-            (h['value'] for h in headers if h['name'] == 'From'),
-            ''
+        return parse_email_message(message)
+    
+    except Exception as e:
+        logger.error(f"Error getting email content: {e}")
+        return None
+
+
+def get_email_contents_batch(service, message_ids: List[str], http=None) -> List[Optional[Tuple[str, str, str, datetime, str]]]:
+    """
+    Get full email content for several message IDs in one batch HTTP request.
+    
+    Up to GMAIL_BATCH_SIZE messages.get calls share a single round trip.
+    Gmail doesn't retry the parts of a batch, so any part that fails (e.g.
+    rate limited) is fetched again on its own, with backoff.
+    
+    Args:
+        service: Gmail API service instance
+        message_ids: Gmail message IDs (at most GMAIL_BATCH_SIZE)
+        http: Optional authorized HTTP client to execute the request with
+              (required when calling from multiple threads)
+    
+    Returns:
+        One (message_id, subject, body, date, sender_email) tuple or None
+        per message ID, in the same order
+    """
+    results: List[Optional[Tuple[str, str, str, datetime, str]]] = [None] * len(message_ids)
+    failed = []
+    
+    def on_response(request_id, response, exception):
+        index = int(request_id)
+        if exception is not None:
+            failed.append(index)
+            return
+        try:
+            results[index] = parse_email_message(response)
+        except Exception as e:
+            logger.error(f"Error getting email content: {e}")
+    
+    batch = service.new_batch_http_request(callback=on_response)
+    for index, message_id in enumerate(message_ids):
+        batch.add(
+            service.users().messages().get(userId='me', id=message_id, format='full'),
+            request_id=str(index)
         )
-        
-        # Extract body from payload
-        body = extract_body(message['payload'])
-        
-        # Extract date: try internalDate (ms since epoch) first
-        email_date = None
-        if 'internalDate' in message:
+    
+    try:
+        batch.execute(http=http)
+    except Exception as e:
+        logger.warning(f"Gmail batch request failed, fetching {len(message_ids)} emails individually: {e}")
+        failed = [index for index, result in enumerate(results) if result is None]
+    
+    for index in failed:
+        results[index] = get_email_content(service, message_ids[index], http=http)
+    
+    return results
+
+
+def parse_email_message(message: dict) -> Tuple[str, str, str, datetime, str]:
+    """
+    Extract content from a Gmail message resource fetched with format='full'.
+    
+    Returns:
+        Tuple of (message_id, subject, body, date, sender_email)
+    """
+    headers = message['payload']['headers']
+    
+    # Extract subject from headers
+    subject = next(
+        (h['value'] for h in headers if h['name'] == 'Subject'), 
+        'No Subject'
+    )
+    
+    # Extract sender email from From header
+    sender = next(
+        (h['value'] for h in headers if h['name'] == 'From'),
+        ''
+    )
+    
+    # Extract body from payload
+    body = extract_body(message['payload'])
+    
+    # Extract date: try internalDate (ms since epoch) first
+    email_date = None
+    if 'internalDate' in message:
+        try:
+            milliseconds = int(message['internalDate'])
+            email_date = datetime.fromtimestamp(milliseconds / 1000.0, tz=timezone.utc)
+        except Exception:
+            pass
+    
+    # Fallback to Date header if internalDate failed
+    if not email_date:
+        date_header = next((h['value'] for h in headers if h['name'] == 'Date'), None)
+        if date_header:
             try:
-                milliseconds = int(message['internalDate'])
-                email_date = datetime.fromtimestamp(milliseconds / 1000.0, tz=timezone.utc)
+                from email.utils import parsedate_to_datetime
+                parsed_date = parsedate_to_datetime(date_header)
+                if parsed_date.tzinfo is None:
+                    parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+                email_date = parsed_date
             except Exception:
                 pass
-        
-        # Fallback to Date header if internalDate failed
-        if not email_date:
-            date_header = next((h['value'] for h in headers if h['name'] == 'Date'), None)
-            if date_header:
-                try:
-                    from email.utils import parsedate_to_datetime
-                    parsed_date = parsedate_to_datetime(date_header)
-                    if parsed_date.tzinfo is None:
-                        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-                    email_date = parsed_date
-                except Exception:
-                    pass
-        
-        # Final fallback to current time
-        if not email_date:
-            email_date = datetime.now(timezone.utc)
-
-        return (message_id, subject, body, email_date, sender)
     
-    except Exception as e:
-        logger.error(f"Error getting email content: {e}")
-        return None
+    # Final fallback to current time
+    if not email_date:
+        email_date = datetime.now(timezone.utc)
+
+    return (message['id'], subject, body, email_date, sender)
 
 
 def extract_body(payload: dict) -> str:
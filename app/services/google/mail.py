@@ -1,14 +1,25 @@
 import os
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Optional
 from datetime import datetime, timedelta, timezone
 import json
+import httplib2
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from app.logging_config import get_logger
-from app.services.google.helper import fetch_messages_paginated, get_email_content
+from app.services.google.helper import (
+    GMAIL_BATCH_SIZE,
+    GMAIL_NUM_RETRIES,
+    fetch_messages_paginated,
+    fetch_history_message_ids,
+    get_email_contents_batch,
+)
 
 logger = get_logger(__name__)
 
@@ -39,6 +50,9 @@ class GmailService:
         'payment alert'
     ]
     
+    # Concurrent batch requests when downloading email content
+    FETCH_CONCURRENCY = 4
+    
     def __init__(
         self,
         credentials_file: str = "credentials.json",
@@ -60,6 +74,7 @@ class GmailService:
         self.credentials_data = credentials_data
         self.token_data = token_data
         self.service = None
+        self.credentials = None
         self._authenticate()
     
     def _authenticate(self) -> None:
@@ -117,6 +132,7 @@ class GmailService:
                     pickle.dump(creds, token)
         
         if creds:
+            self.credentials = creds
             self.service = build('gmail', 'v1', credentials=creds)
         else:
             raise Exception("Failed to authenticate Gmail API")
@@ -145,49 +161,136 @@ class GmailService:
         Returns:
             List of tuples (message_id, subject, body, date, sender_email)
         """
+        message_ids = self.list_bank_message_ids(
+            max_results, since_date, until_date, query, ascending, chunk_days
+        )
+        try:
+            return self.get_email_contents(message_ids)
+        except Exception as e:
+            logger.error(f"Error fetching emails: {e}")
+            return []
+    
+    def list_bank_message_ids(
+        self, 
+        max_results: Optional[int] = 10, 
+        since_date: Optional[datetime] = None,
+        until_date: Optional[datetime] = None,
+        query: Optional[str] = None, 
+        ascending: bool = False, 
+        chunk_days: int = 7
+    ) -> List[str]:
+        """
+        List the IDs of bank transaction emails without downloading them.
+        
+        Takes the same arguments as fetch_bank_emails. Callers processing
+        large mailboxes can pass slices of the result to get_email_contents
+        so only one batch of message bodies is held in memory at a time.
+
+        Returns:
+            List of message IDs, in the order fetch_bank_emails would return them
+        """
         if not self.service:
             logger.error("Error: Gmail service not initialized")
             return []
         
         try:
             # Build base query: use custom query or construct from bank keywords
-            if query:
-                base_query = query
-            else:
-                quoted_keywords = [f'"{keyword}"' for keyword in self.BANK_KEYWORDS]
-                base_query = f"({' OR '.join(quoted_keywords)})"
+            base_query = query or self.build_bank_query()
 
             # Choose between ascending (date-chunked) or standard fetch
             if ascending:
-                return self._fetch_ascending_order(base_query, max_results, since_date, until_date, chunk_days)
+                return self._list_ascending_order(base_query, max_results, since_date, until_date, chunk_days)
             else:
-                return self._fetch_standard_order(base_query, max_results, since_date, until_date)
+                return self._list_standard_order(base_query, max_results, since_date, until_date)
         
         except Exception as e:
             logger.error(f"Error fetching emails: {e}")
             return []
+
+    @classmethod
+    def build_bank_query(
+        cls,
+        sender_allowlist: Optional[List[str]] = None,
+        excluded_categories: Optional[List[str]] = None
+    ) -> str:
+        """
+        Build the Gmail `q` string for bank transaction emails.
+
+        Filtering server-side means mail that can never be a transaction is
+        neither downloaded nor run through the coordinator.
+
+        Args:
+            sender_allowlist: Sender addresses or domains; if given, only mail
+                              from these senders matches.
+            excluded_categories: Gmail inbox categories to leave out
+                                 (e.g. promotions, social).
+
+        Returns:
+            Gmail search query string
+        """
+        quoted_keywords = [f'"{keyword}"' for keyword in cls.BANK_KEYWORDS]
+        parts = [f"({' OR '.join(quoted_keywords)})"]
+        if sender_allowlist:
+            parts.append(f"from:({' OR '.join(sender_allowlist)})")
+        for category in excluded_categories or []:
+            parts.append(f"-category:{category}")
+        return " ".join(parts)
+
+    def get_latest_history_id(self) -> Optional[str]:
+        """Return the mailbox's current historyId, or None if it can't be read."""
+        if not self.service:
+            return None
+        try:
+            profile = self.service.users().getProfile(userId='me').execute(num_retries=GMAIL_NUM_RETRIES)
+            return str(profile['historyId'])
+        except Exception as e:
+            logger.error(f"Error fetching Gmail historyId: {e}")
+            return None
+    
+    def list_added_message_ids(self, start_history_id: str) -> Optional[List[str]]:
+        """
+        List IDs of messages added since start_history_id via the History API.
+        
+        Returns:
+            Added message IDs (possibly empty), or None when the history can't
+            be used (historyId expired or the request failed) and the caller
+            should fall back to a date-range search
+        """
+        if not self.service:
+            return None
+        try:
+            return fetch_history_message_ids(self.service, start_history_id)
+        except HttpError as e:
+            if e.resp.status == 404:
+                logger.info(f"Gmail historyId {start_history_id} expired, falling back to date-range sync")
+            else:
+                logger.error(f"Error listing Gmail history: {e}")
+            return None
+        except Exception as e:
+            logger.error(f"Error listing Gmail history: {e}")
+            return None
     
-    def _fetch_ascending_order(
+    def _list_ascending_order(
         self, 
         base_query: str, 
         max_results: Optional[int], 
         since_date: Optional[datetime],
         until_date: Optional[datetime],
         chunk_days: int
-    ) -> List[Tuple[str, str, str, datetime, str]]:
-        """Fetch emails in ascending order (oldest first) using date chunks."""
+    ) -> List[str]:
+        """List message IDs in ascending order (oldest first) using date chunks."""
         
         # Set date range: default to 6 months ago if not provided
         start_date = since_date or (datetime.now(timezone.utc) - timedelta(days=180))
         end_date = until_date or datetime.now(timezone.utc)
         chunk_days = max(1, chunk_days)  # Enforce minimum chunk size
         
-        emails = []
+        message_ids = []
         seen_ids = set()
         current_start = start_date
         
         # Process date range in chunks to handle large result sets
-        while current_start <= end_date and (max_results is None or len(emails) < max_results):
+        while current_start <= end_date and (max_results is None or len(message_ids) < max_results):
             chunk_end = min(current_start + timedelta(days=chunk_days), end_date)
             
             # Build query with date range using epoch timestamps
@@ -198,40 +301,38 @@ class GmailService:
             # Calculate remaining results needed for this chunk
             remaining = None
             if max_results is not None:
-                remaining = max_results - len(emails)
+                remaining = max_results - len(message_ids)
             
             # Fetch message IDs for this chunk
             messages = fetch_messages_paginated(self.service, chunk_query, remaining)
             
             if messages:
                 # Process messages in reverse order (oldest first within chunk)
+                chunk_ids = []
                 for message in reversed(messages):
                     message_id = message.get('id')
-                    
                     if not message_id or message_id in seen_ids:
                         continue
-                    
-                    email_data = get_email_content(self.service, message_id)
-                    if email_data:
-                        emails.append(email_data)
-                        seen_ids.add(message_id)
-                    
-                    if max_results is not None and len(emails) >= max_results:
-                        break
+                    seen_ids.add(message_id)
+                    chunk_ids.append(message_id)
+                
+                if remaining is not None:
+                    chunk_ids = chunk_ids[:remaining]
+                message_ids.extend(chunk_ids)
             
             # Move to next chunk
             current_start = chunk_end + timedelta(seconds=1)
         
-        return emails
+        return message_ids
     
-    def _fetch_standard_order(
+    def _list_standard_order(
         self, 
         base_query: str, 
         max_results: Optional[int], 
         since_date: Optional[datetime],
         until_date: Optional[datetime]
-    ) -> List[Tuple[str, str, str, datetime, str]]:
-        """Fetch emails using standard query (newest first)."""
+    ) -> List[str]:
+        """List message IDs using standard query (newest first)."""
         
         # Add date filter to query if provided
         query = base_query
@@ -244,19 +345,37 @@ class GmailService:
         
         # Fetch message IDs from Gmail
         messages = fetch_messages_paginated(self.service, query, max_results)
-        if not messages:
+        return [message['id'] for message in messages if message.get('id')]
+    
+    def get_email_contents(self, message_ids: List[str]) -> List[Tuple[str, str, str, datetime, str]]:
+        """
+        Fetch full content for message IDs, preserving their order.
+        
+        IDs are fetched GMAIL_BATCH_SIZE at a time with batch HTTP requests,
+        so each round trip carries many messages.get calls, and up to
+        FETCH_CONCURRENCY batches run at once. httplib2 is not thread-safe,
+        so every worker thread executes requests with its own authorized
+        client. Messages that fail to download are dropped, as before.
+        """
+        if not message_ids:
             return []
         
-        # Fetch full email content for each message
-        emails = []
-        for message in messages:
-            message_id = message.get('id')
-            if not message_id:
-                continue
-            
-            email_data = get_email_content(self.service, message_id)
-            if email_data:
-                emails.append(email_data)
+        chunks = [
+            message_ids[i:i + GMAIL_BATCH_SIZE]
+            for i in range(0, len(message_ids), GMAIL_BATCH_SIZE)
+        ]
+        local = threading.local()
+        
+        def fetch(chunk: List[str]):
+            http = getattr(local, 'http', None)
+            if http is None:
+                http = local.http = AuthorizedHttp(self.credentials, http=httplib2.Http())
+            return get_email_contents_batch(self.service, chunk, http=http)
         
-        return emails
-    
\ No newline at end of file
+        with ThreadPoolExecutor(max_workers=min(self.FETCH_CONCURRENCY, len(chunks))) as pool:
+            return [
+                email_data
+                for chunk_results in pool.map(fetch, chunks)
+                for email_data in chunk_results
+                if email_data
+            ]
@@ -0,0 +1,85 @@
+"""
+Pattern Cache
+
+Negative cache for streak updates (Task B): remembers which transactors of a
+user had no active recurring pattern, so their updates can skip the pattern
+queries. Entries live in Redis, shared by every worker and the API, so that
+discovering patterns for a user clears them everywhere at once instead of
+leaving other workers to skip that user's transactions until the TTL runs out.
+"""
+import time
+from typing import List, Optional, Tuple
+
+import redis
+
+from app.config import settings
+from app.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# One hash per user: field "<transactor_id>:<direction>" -> expiry (epoch seconds)
+_KEY_PREFIX = "pattern:no_active:"
+
+_client: Optional[redis.Redis] = None
+
+
+def _get_client() -> redis.Redis:
+    """Return this process's Redis client (the broker's Redis), creating it on first use."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=1.0)
+    return _client
+
+
+def _key(user_id: str) -> str:
+    return f"{_KEY_PREFIX}{user_id}"
+
+
+def _field(transactor_id: str, direction: str) -> str:
+    return f"{transactor_id}:{direction}"
+
+
+def get_cached_no_pattern(user_id: str, pairs: List[Tuple[str, str]]) -> List[bool]:
+    """
+    Look up (transactor_id, direction) pairs of a user with one round trip.
+
+    Returns:
+        Per pair, whether it is cached as having no active pattern. When
+        Redis is unreachable every pair is reported uncached.
+    """
+    if not pairs:
+        return []
+    try:
+        expiries = _get_client().hmget(_key(user_id), [_field(*pair) for pair in pairs])
+    except redis.RedisError as e:
+        logger.warning(f"[PATTERN] No-pattern cache lookup failed, processing uncached: {e}")
+        return [False] * len(pairs)
+    now = time.time()
+    return [expiry is not None and float(expiry) > now for expiry in expiries]
+
+
+def cache_no_pattern(user_id: str, pairs: List[Tuple[str, str]]) -> None:
+    """Remember that these (transactor_id, direction) pairs of a user have no active pattern."""
+    if not pairs:
+        return
+    ttl = settings.PATTERN_NEGATIVE_CACHE_TTL_SECONDS
+    expires_at = time.time() + ttl
+    try:
+        pipeline = _get_client().pipeline()
+        pipeline.hset(_key(user_id), mapping={_field(*pair): expires_at for pair in pairs})
+        # Fields expire individually; the key's TTL drops the hash of idle users
+        pipeline.expire(_key(user_id), ttl)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"[PATTERN] Could not update no-pattern cache for user {user_id}: {e}")
+
+
+def clear_no_pattern_cache(user_id: str) -> None:
+    """Forget every cached no-pattern answer of a user (e.g. after new patterns were saved)."""
+    try:
+        _get_client().delete(_key(user_id))
+    except redis.RedisError as e:
+        logger.error(
+            f"[PATTERN] Could not clear no-pattern cache for user {user_id}; entries expire "
+            f"within {settings.PATTERN_NEGATIVE_CACHE_TTL_SECONDS}s: {e}"
+        )
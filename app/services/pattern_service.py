@@ -5,14 +5,16 @@ Orchestrates pattern discovery and obligation tracking.
 Acts as the main interface for pattern-related operations.
 """
 from datetime import datetime, timedelta, timezone
+import asyncio
 from typing import List, Optional, Dict, Tuple
 from decimal import Decimal
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, desc, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, selectinload
 import uuid
 
 from app.logging_config import get_logger
+from app.services.pattern_cache import clear_no_pattern_cache
 
 logger = get_logger(__name__)
 
@@ -20,7 +22,7 @@ from agent.regex_constants import CURRENCY_SYMBOLS
 from app.models import (
     Transaction, RecurringPattern, RecurringPatternStreak,
     PatternTransaction, PatternObligation, Transactor,
-    User, Currency
+    User
 )
 from agent.pattern_discovery_engine import (
     DeterministicPatternDiscovery,
@@ -82,17 +84,34 @@ class PatternService:
         logger.info(f"[PATTERN_DISCOVERY] Found {len(groups)} transaction groups to analyze")
         
         discovered_patterns = []
-        
         for group in groups:
-            # Run discovery for this group
-            patterns = await self._discover_patterns_for_group(
+            discovery_txns, account_id = await self._load_group_transactions(
                 user_id=user_id,
                 transactor_id=group['transactor_id'],
                 direction=group['direction'],
                 currency_id=group['currency_id']
             )
+            if not discovery_txns:
+                continue
+            
+            patterns = await self._save_group_candidates(
+                user_id=user_id,
+                transactor_id=group['transactor_id'],
+                direction=group['direction'],
+                currency_id=group['currency_id'],
+                candidates=self._run_discovery(discovery_txns),
+                account_id=account_id
+            )
             discovered_patterns.extend(patterns)
         
+        # Single commit for the whole run instead of one per saved pattern
+        await self.db.commit()
+        if discovered_patterns:
+            # Streak updates cached as "no active pattern" for this user may
+            # now have one, in every worker
+            await asyncio.to_thread(clear_no_pattern_cache, str(user_id))
+        logger.info(f"[PATTERN_DISCOVERY] Saved {len(discovered_patterns)} patterns for user {user_id}")
+        
         return discovered_patterns
     
     async def _get_transaction_groups(
@@ -156,88 +175,103 @@ class PatternService:
             for r in groups
         ]
     
-    async def _discover_patterns_for_group(
+    async def _load_group_transactions(
         self,
         user_id: uuid.UUID,
         transactor_id: uuid.UUID,
         direction: str,
         currency_id: uuid.UUID
-    ) -> List[Dict]:
+    ) -> Tuple[List[DiscoveryTransaction], Optional[str]]:
         """
-        Discover patterns for a single (transactor, direction, currency) group.
-        Only processes transactions NOT already linked to any pattern.
+        Load discovery input for a single (transactor, direction, currency) group.
+        Only returns transactions NOT already linked to any pattern, along with the
+        group's most common account_id. Returns an empty list if there are too few.
         """
         logger.debug(f"[PATTERN_DISCOVERY] Analyzing group: transactor={transactor_id}, direction={direction}")
         
-        # Fetch transactions for this group, sorted by date
-        stmt = select(Transaction).where(
+        # Fetch only the columns discovery needs, sorted by date. The "already linked
+        # to a pattern" flag is resolved in the same query, and rows are streamed so
+        # large groups are never materialized as ORM instances.
+        is_linked = select(PatternTransaction.id).where(
+            PatternTransaction.transaction_id == Transaction.id
+        ).exists()
+        stmt = select(
+            Transaction.id,
+            Transaction.date,
+            Transaction.amount,
+            Transaction.account_id,
+            is_linked.label('is_linked'),
+        ).where(
             Transaction.user_id == user_id,
             Transaction.transactor_id == transactor_id,
             Transaction.type == direction,
             Transaction.currency_id == currency_id
         ).order_by(Transaction.date.asc())
-        
-        result = await self.db.execute(stmt)
-        all_transactions = result.scalars().all()
-
-        logger.debug(f"[PATTERN_DISCOVERY] Found {len(all_transactions)} total transactions for this group")
 
-        # Derive most common account_id for this group
+        total_count = 0
+        linked_count = 0
         account_id_counts: Dict[str, int] = {}
-        for t in all_transactions:
-            if t.account_id:
-                account_id_counts[str(t.account_id)] = account_id_counts.get(str(t.account_id), 0) + 1
-        most_common_account_id = max(account_id_counts, key=account_id_counts.get) if account_id_counts else None
+        discovery_txns = []
 
-        # Get already-linked transaction IDs to exclude them from discovery
-        linked_result = await self.db.execute(
-            select(PatternTransaction.transaction_id)
-            .where(PatternTransaction.transaction_id.in_([t.id for t in all_transactions]))
-        )
-        linked_ids = {row[0] for row in linked_result.all()}
-        
-        # Filter to only unassigned transactions
-        transactions = [t for t in all_transactions if t.id not in linked_ids]
-        
-        logger.info(f"[PATTERN_DISCOVERY] After filtering linked transactions: {len(transactions)} unassigned, "
-                   f"{len(linked_ids)} already linked, {len(all_transactions)} total")
-        
-        if len(transactions) < DeterministicPatternDiscovery.MIN_TRANSACTIONS_REQUIRED:
-            logger.debug(f"[PATTERN_DISCOVERY] Not enough transactions ({len(transactions)} < {DeterministicPatternDiscovery.MIN_TRANSACTIONS_REQUIRED}), skipping")
-            return []
-        
-        # Convert to discovery format
-        discovery_txns = [
-            DiscoveryTransaction(
-                txn_id=str(t.id),
-                txn_date=t.date,
-                amount=t.amount
+        async for row in await self.db.stream(stmt):
+            total_count += 1
+
+            # Most common account_id is derived over the whole group
+            if row.account_id:
+                account_id_counts[str(row.account_id)] = account_id_counts.get(str(row.account_id), 0) + 1
+
+            # Exclude transactions already linked to a pattern from discovery
+            if row.is_linked:
+                linked_count += 1
+                continue
+
+            discovery_txns.append(
+                DiscoveryTransaction(
+                    txn_id=str(row.id),
+                    txn_date=row.date,
+                    amount=row.amount
+                )
             )
-            for t in transactions
-        ]
-        
-        # Run deterministic discovery
-        logger.info(f"[PATTERN_DISCOVERY] Running deterministic discovery on {len(discovery_txns)} transactions")
+
+        most_common_account_id = max(account_id_counts, key=account_id_counts.get) if account_id_counts else None
+
+        logger.debug("[PATTERN_DISCOVERY] After filtering linked transactions: %d unassigned, "
+                     "%d already linked, %d total", len(discovery_txns), linked_count, total_count)
+
+        if len(discovery_txns) < DeterministicPatternDiscovery.MIN_TRANSACTIONS_REQUIRED:
+            logger.debug(f"[PATTERN_DISCOVERY] Not enough transactions ({len(discovery_txns)} < {DeterministicPatternDiscovery.MIN_TRANSACTIONS_REQUIRED}), skipping")
+            return [], most_common_account_id
+
+        return discovery_txns, most_common_account_id
+    
+    @staticmethod
+    def _run_discovery(discovery_txns: List[DiscoveryTransaction]) -> List[PatternCandidate]:
+        """Run the deterministic discovery engine (pure CPU, no session access)"""
+        logger.debug("[PATTERN_DISCOVERY] Running deterministic discovery on %d transactions", len(discovery_txns))
         engine = DeterministicPatternDiscovery(discovery_txns)
         candidates = engine.discover_patterns()
         
-        logger.info(f"[PATTERN_DISCOVERY] Discovery engine found {len(candidates)} pattern candidates")
-        
+        logger.debug("[PATTERN_DISCOVERY] Discovery engine found %d pattern candidates", len(candidates))
+        return candidates
+    
+    async def _save_group_candidates(
+        self,
+        user_id: uuid.UUID,
+        transactor_id: uuid.UUID,
+        direction: str,
+        currency_id: uuid.UUID,
+        candidates: List[PatternCandidate],
+        account_id: Optional[str] = None,
+    ) -> List[Dict]:
+        """Save the discovery candidates found for a single group"""
         if not candidates:
             logger.debug(f"[PATTERN_DISCOVERY] No patterns found for this group")
             return []
         
-        # Get transactor and currency info
-        transactor_result = await self.db.execute(
-            select(Transactor).where(Transactor.id == transactor_id)
-        )
-        transactor = transactor_result.scalar_one_or_none()
-        
-        currency_result = await self.db.execute(
-            select(Currency).where(Currency.id == currency_id)
-        )
-        currency = currency_result.scalar_one_or_none()
-        
+        # Get transactor info. session.get() serves it from the identity map when the
+        # same transactor was already loaded for another (direction, currency) group.
+        transactor = await self.db.get(Transactor, transactor_id)
+
         # Process each candidate
         discovered = []
         for idx, candidate in enumerate(candidates, 1):
@@ -245,7 +279,7 @@ class PatternService:
                         f"case={candidate.pattern_case.value}, interval={candidate.interval_days}d, "
                         f"confidence={candidate.confidence:.2f}")
             
-            logger.info(f"[PATTERN_DISCOVERY] Saving candidate {idx} to database")
+            logger.debug("[PATTERN_DISCOVERY] Saving candidate %d to database", idx)
 
             # Save to database
             pattern = await self._save_pattern(
@@ -254,7 +288,7 @@ class PatternService:
                 direction=direction,
                 currency_id=currency_id,
                 candidate=candidate,
-                account_id=most_common_account_id,
+                account_id=account_id,
             )
             
             # Skip if pattern was not saved (duplicate amount cluster)
@@ -280,7 +314,7 @@ class PatternService:
         account_id: Optional[str] = None,
     ) -> Optional[RecurringPattern]:
         """
-        Save discovered pattern to database.
+        Stage discovered pattern in the session (caller commits).
         Creates pattern, streak, initial obligation, and links transactions.
         
         Returns None if pattern is skipped due to duplicate amount cluster.
@@ -288,13 +322,14 @@ class PatternService:
         """
         logger.debug(f"[PATTERN_SAVE] Checking for existing pattern: user={user_id}, transactor={transactor_id}, direction={direction}, avg_amount={candidate.cluster.avg_amount}")
         
-        # Check if pattern already exists (including amount range overlap check)
+        # Check if pattern already exists (including amount range overlap check).
+        # The streak is joined in so an update below does not need its own SELECT.
         existing_result = await self.db.execute(
             select(RecurringPattern).where(
                 RecurringPattern.user_id == user_id,
                 RecurringPattern.transactor_id == transactor_id,
                 RecurringPattern.direction == direction
-            )
+            ).options(joinedload(RecurringPattern.streak))
         )
         existing_patterns = existing_result.scalars().all()
         
@@ -335,7 +370,7 @@ class PatternService:
                                 f"diff=₹{amount_diff:.2f}, threshold=₹{overlap_threshold:.2f}, overlap={overlap}")
                     
                     if overlap:
-                        logger.info(f"[PATTERN_SAVE] Amount ranges overlap - updating pattern {pattern.id} instead of creating duplicate")
+                        logger.debug("[PATTERN_SAVE] Amount ranges overlap - updating pattern %s instead of creating duplicate", pattern.id)
                         existing = pattern
                         break
             
@@ -349,23 +384,40 @@ class PatternService:
                              f"Consider removing unique constraint to support multiple amount-based patterns.")
                 return None  # Skip this pattern candidate
         
+        now = datetime.now(timezone.utc)
+        last_txn_date = candidate.transactions[-1].txn_date
+        txn_ids = [uuid.UUID(txn.txn_id) for txn in candidate.transactions]
+        
         if existing:
             # Update existing pattern
-            logger.info(f"[PATTERN_SAVE] Updating existing pattern {existing.id}, incrementing version to {existing.detection_version + 1}")
+            logger.debug("[PATTERN_SAVE] Updating existing pattern %s, incrementing version to %d",
+                         existing.id, existing.detection_version + 1)
             existing.pattern_type = self._map_pattern_case_to_type(candidate.pattern_case)
             existing.interval_days = candidate.interval_days or 30
             existing.amount_behavior = candidate.amount_behavior.value
             existing.confidence = Decimal(str(candidate.confidence))
             existing.status = 'ACTIVE'
-            existing.detected_at = datetime.now(timezone.utc)
-            existing.last_evaluated_at = datetime.now(timezone.utc)
+            existing.detected_at = now
+            existing.last_evaluated_at = now
             existing.detection_version += 1
             if account_id and not existing.account_id:
                 existing.account_id = account_id
             pattern = existing
+            streak = pattern.streak
+            
+            # Check which candidate transactions are already linked, in one query
+            linked_result = await self.db.execute(
+                select(PatternTransaction.transaction_id).where(
+                    PatternTransaction.recurring_pattern_id == pattern.id,
+                    PatternTransaction.transaction_id.in_(txn_ids)
+                )
+            )
+            already_linked = set(linked_result.scalars().all())
         else:
-            # Create new pattern
-            logger.info(f"[PATTERN_SAVE] Creating new pattern for transactor {transactor_id}")
+            # Create new pattern. The id is generated client-side, so the pattern,
+            # streak, links and obligation are all queued without intermediate
+            # flushes and inserted together at commit.
+            logger.debug("[PATTERN_SAVE] Creating new pattern for transactor %s", transactor_id)
             pattern = RecurringPattern(
                 id=uuid.uuid4(),
                 user_id=user_id,
@@ -376,25 +428,16 @@ class PatternService:
                 amount_behavior=candidate.amount_behavior.value,
                 status='ACTIVE',
                 confidence=Decimal(str(candidate.confidence)),
-                detected_at=datetime.now(timezone.utc),
-                last_evaluated_at=datetime.now(timezone.utc),
+                detected_at=now,
+                last_evaluated_at=now,
                 detection_version=1,
                 account_id=account_id,
             )
             self.db.add(pattern)
-        
-        await self.db.flush()
+            streak = None
+            already_linked = set()
         
         # Create or update streak
-        streak_result = await self.db.execute(
-            select(RecurringPatternStreak).where(
-                RecurringPatternStreak.recurring_pattern_id == pattern.id
-            )
-        )
-        streak = streak_result.scalar_one_or_none()
-        
-        last_txn_date = candidate.transactions[-1].txn_date
-        
         if not streak:
             logger.debug(f"[PATTERN_SAVE] Creating new streak record with {len(candidate.transactions)} transactions")
             streak = RecurringPatternStreak(
@@ -406,7 +449,9 @@ class PatternService:
                 missed_count=0,
                 confidence_multiplier=Decimal('1.0')
             )
-            self.db.add(streak)
+            # Attach through the relationship so later reads of pattern.streak
+            # in this session hit the loaded object instead of a lazy load
+            pattern.streak = streak
         else:
             logger.debug(f"[PATTERN_SAVE] Updating existing streak record")
             streak.current_streak_count = len(candidate.transactions)
@@ -414,38 +459,23 @@ class PatternService:
             streak.last_actual_date = last_txn_date
             streak.confidence_multiplier = Decimal('1.0')
         
-        await self.db.flush()
-        
         # Link transactions to pattern
-        for txn in candidate.transactions:
-            # Check if already linked
-            existing_link_result = await self.db.execute(
-                select(PatternTransaction).where(
-                    PatternTransaction.recurring_pattern_id == pattern.id,
-                    PatternTransaction.transaction_id == uuid.UUID(txn.txn_id)
-                )
+        self.db.add_all([
+            PatternTransaction(
+                id=uuid.uuid4(),
+                recurring_pattern_id=pattern.id,
+                transaction_id=txn_id,
+                linked_at=now
             )
-            existing_link = existing_link_result.scalar_one_or_none()
-            
-            if not existing_link:
-                link = PatternTransaction(
-                    id=uuid.uuid4(),
-                    recurring_pattern_id=pattern.id,
-                    transaction_id=uuid.UUID(txn.txn_id),
-                    linked_at=datetime.now(timezone.utc)
-                )
-                self.db.add(link)
+            for txn_id in txn_ids
+            if txn_id not in already_linked
+        ])
         
         # Create initial obligation
         logger.debug(f"[PATTERN_SAVE] Creating initial obligation for pattern {pattern.id}")
         await self._create_next_obligation(pattern, candidate)
         
-        await self.db.commit()
-        
-        # Refresh to load relationships
-        await self.db.refresh(pattern, ['transactor'])
-        
-        logger.info(f"[PATTERN_SAVE] Successfully saved pattern {pattern.id} with {len(candidate.transactions)} linked transactions")
+        logger.debug("[PATTERN_SAVE] Staged pattern %s with %d linked transactions", pattern.id, len(candidate.transactions))
         
         return pattern
     
@@ -502,7 +532,6 @@ class PatternService:
             status='EXPECTED'
         )
         self.db.add(db_obligation)
-        await self.db.flush()
         
         return db_obligation
     
@@ -672,36 +701,75 @@ class PatternService:
         
         NO PATTERN DISCOVERY happens in this flow.
         """
-        logger.info(f"[PATTERN_MATCH] Processing new transaction {transaction_id}")
+        logger.debug("[PATTERN_MATCH] Processing new transaction %s", transaction_id)
         
-        # Get transaction
-        txn_result = await self.db.execute(
-            select(Transaction).where(Transaction.id == transaction_id)
-        )
-        transaction = txn_result.scalar_one_or_none()
+        # Get transaction (served from the identity map when the caller already loaded it)
+        transaction = await self.db.get(Transaction, transaction_id)
         
         if not transaction or not transaction.transactor_id:
             logger.warning(f"[PATTERN_MATCH] Transaction {transaction_id} not found or has no transactor")
             return {'matched': False, 'reason': 'No transactor'}
         
+        result = await self._match_transaction(transaction)
+        await self.db.commit()
+        return result
+    
+    async def process_new_transactions(
+        self,
+        transaction_ids: List[str]
+    ) -> Dict[str, Dict]:
+        """
+        Batch variant of process_new_transaction.
+        
+        Transactions are matched in date order so streak state advances the
+        same way as with one task per transaction, but the whole batch shares
+        one session and a single commit.
+        
+        Returns:
+            Mapping of transaction id to its process_new_transaction-style result
+        """
+        logger.info(f"[PATTERN_MATCH] Processing batch of {len(transaction_ids)} transactions")
+        
+        txn_result = await self.db.execute(
+            select(Transaction)
+            .where(Transaction.id.in_(transaction_ids))
+            .order_by(Transaction.date)
+        )
+        transactions = txn_result.scalars().all()
+        
+        results = {
+            txn_id: {'matched': False, 'reason': 'No transactor'}
+            for txn_id in transaction_ids
+        }
+        for transaction in transactions:
+            if transaction.transactor_id:
+                results[transaction.id] = await self._match_transaction(transaction)
+        
+        await self.db.commit()
+        return results
+    
+    async def _match_transaction(self, transaction: Transaction) -> Dict:
+        """Match one transaction against its active patterns (caller commits)"""
         # Get active patterns for this (user, transactor, direction, currency)
-        logger.debug(f"[PATTERN_MATCH] Looking for active patterns: user={transaction.user_id}, "
-                    f"transactor={transaction.transactor_id}, direction={transaction.type}")
+        logger.debug("[PATTERN_MATCH] Looking for active patterns: user=%s, transactor=%s, direction=%s",
+                     transaction.user_id, transaction.transactor_id, transaction.type)
         
+        # Streak is one-to-one: LEFT JOIN it in the same round-trip instead of
+        # the second SELECT selectinload would issue
         patterns_result = await self.db.execute(
             select(RecurringPattern).where(
                 RecurringPattern.user_id == transaction.user_id,
                 RecurringPattern.transactor_id == transaction.transactor_id,
                 RecurringPattern.direction == transaction.type,
                 RecurringPattern.status.in_(['ACTIVE', 'PAUSED'])
-            ).options(selectinload(RecurringPattern.streak))
+            ).options(joinedload(RecurringPattern.streak))
         )
         patterns = patterns_result.scalars().all()
         
-        logger.info(f"[PATTERN_MATCH] Found {len(patterns)} active patterns to check")
+        logger.debug("[PATTERN_MATCH] Found %d active patterns to check", len(patterns))
         
         if not patterns:
-            logger.debug(f"[PATTERN_MATCH] No active patterns found for this transaction")
+            logger.debug("[PATTERN_MATCH] No active patterns found for this transaction")
             return {'matched': False, 'reason': 'No active patterns'}
         
         # Process against each pattern
@@ -716,7 +784,7 @@ class PatternService:
             
             state = PatternState(
                 pattern_id=str(pattern.id),
-                pattern_case=PatternCase[pattern.pattern_type] if hasattr(PatternCase, pattern.pattern_type) else PatternCase.FIXED_MONTHLY,
+                pattern_case=PatternCase.__members__.get(pattern.pattern_type, PatternCase.FIXED_MONTHLY),
                 interval_days=pattern.interval_days,
                 amount_behavior=AmountBehaviorType[pattern.amount_behavior],
                 last_actual_date=streak.last_actual_date,
@@ -728,27 +796,24 @@ class PatternService:
             )
             
             # Check match
-            results = TransactionProcessor.process_transaction(
+            updated_state, was_matched = TransactionProcessor.process_for_pattern(
                 transaction_date=transaction.date,
-                transaction_amount=transaction.amount,
-                active_patterns=[state],
+                state=state,
                 current_date=current_date
             )
             
-            for updated_state, was_matched in results:
-                if was_matched:
-                    logger.info(f"[PATTERN_MATCH] Transaction matched pattern {pattern.id}")
-                    # Update database
-                    await self._apply_state_update(pattern, updated_state, transaction)
-                    matches.append({
-                        'pattern_id': str(pattern.id),
-                        'matched': True
-                    })
-                else:
-                    logger.debug(f"[PATTERN_MATCH] Transaction did not match pattern {pattern.id}")
-        
-        await self.db.commit()
-        logger.info(f"[PATTERN_MATCH] Processing complete: {len(matches)} matches found")
+            if was_matched:
+                logger.debug("[PATTERN_MATCH] Transaction matched pattern %s", pattern.id)
+                # Update database
+                await self._apply_state_update(pattern, updated_state, transaction, current_date)
+                matches.append({
+                    'pattern_id': str(pattern.id),
+                    'matched': True
+                })
+            else:
+                logger.debug("[PATTERN_MATCH] Transaction did not match pattern %s", pattern.id)
+        
+        logger.debug("[PATTERN_MATCH] Processing complete: %d matches found", len(matches))
         
         return {
             'matched': len(matches) > 0,
@@ -759,10 +824,11 @@ class PatternService:
         self,
         pattern: RecurringPattern,
         state: PatternState,
-        transaction: Transaction
+        transaction: Transaction,
+        now: datetime
     ):
         """Apply state updates to database"""
-        logger.debug(f"[PATTERN_UPDATE] Applying state update for pattern {pattern.id}")
+        logger.debug("[PATTERN_UPDATE] Applying state update for pattern %s", pattern.id)
         
         # Update streak
         streak = pattern.streak
@@ -772,11 +838,13 @@ class PatternService:
             streak.last_actual_date = state.last_actual_date
             streak.last_expected_date = state.next_expected_date
             streak.missed_count = state.missed_count
-            streak.confidence_multiplier = Decimal(str(state.confidence_multiplier))
+            # NUMERIC(4,3) column: bind the rounded float and let the driver
+            # encode it once, rather than formatting and re-parsing a Decimal
+            streak.confidence_multiplier = round(state.confidence_multiplier, 3)
         
         # Update pattern
         pattern.status = state.status
-        pattern.last_evaluated_at = datetime.now(timezone.utc)
+        pattern.last_evaluated_at = now
         
         # Mark obligation as fulfilled
         pending_obl_result = await self.db.execute(
@@ -789,13 +857,12 @@ class PatternService:
         
         if pending_obligation:
             days_early = (pending_obligation.expected_date - transaction.date).days
-            logger.info(f"[PATTERN_UPDATE] Fulfilling obligation {pending_obligation.id}, "
-                       f"expected: {pending_obligation.expected_date}, actual: {transaction.date}, "
-                       f"days_early: {days_early}")
+            logger.debug("[PATTERN_UPDATE] Fulfilling obligation %s, expected: %s, actual: %s, days_early: %d",
+                         pending_obligation.id, pending_obligation.expected_date, transaction.date, days_early)
             pending_obligation.status = 'FULFILLED'
             pending_obligation.fulfilled_by_transaction_id = transaction.id
             pending_obligation.fulfilled_at = transaction.date
-            pending_obligation.days_early = Decimal(str(days_early))
+            pending_obligation.days_early = Decimal(days_early)  # int: exact, no str() needed
         else:
             logger.warning(f"[PATTERN_UPDATE] No pending obligation found for pattern {pattern.id}")
         
@@ -807,7 +874,7 @@ class PatternService:
             id=uuid.uuid4(),
             recurring_pattern_id=pattern.id,
             transaction_id=transaction.id,
-            linked_at=datetime.now(timezone.utc)
+            linked_at=now
         )
         self.db.add(link)
     
@@ -1,42 +1,51 @@
 """
 Transaction Handler Service for async processing.
 
-When a new transaction is created, queue streak update tasks asynchronously.
-impl_2.md: Task B (streak updates) must be triggered on EVERY transaction.
+When new transactions are created, queue streak update tasks asynchronously.
+impl_2.md: Task B (streak updates) must be triggered on EVERY transaction;
+batch processors queue one task per batch with queue_streak_updates().
 """
 
-from app.models.transaction import Transaction
+from typing import List
+
 from app.logging_config import get_logger
 
 logger = get_logger(__name__)
 
 
-async def handle_new_transaction(transaction: Transaction) -> None:
+def streak_update_item(transaction_id: str, transactor_id: str, direction: str) -> dict:
+    """
+    Describe a persisted transaction for the batched Task B.
+
+    Batch processors collect these while iterating and hand them to
+    queue_streak_updates() once, instead of calling .delay() per row.
+    Callers pass plain values (read right after the insert), so a later
+    rollback in the same session cannot affect the queued call.
     """
-    Called right after a transaction is persisted to database.
-    Queues async streak update task.
-    
+    return {
+        "transaction_id": str(transaction_id),
+        "transactor_id": str(transactor_id),
+        "direction": direction,
+    }
+
+
+async def queue_streak_updates(user_id: str, items: List[dict]) -> None:
+    """
+    Queue one batched streak update task for a user's new transactions.
+
     Args:
-        transaction: The newly created Transaction object
-    
-    Returns:
-        None (async task queued, no blocking)
+        user_id: Owner of all transactions in the batch
+        items: Entries built with streak_update_item()
     """
+    if not items:
+        return
+
     # Import here to avoid circular dependency
-    from app.celery.celery_tasks import update_recurring_streak
-    
+    from app.celery.celery_tasks import update_recurring_streaks_batch
+
     try:
-        # Queue streak update task asynchronously
-        # impl_2.md: Task B runs on EVERY transaction
-        update_recurring_streak.delay(
-            user_id=str(transaction.user_id),
-            transactor_id=str(transaction.transactor_id),
-            direction=transaction.type,  # DEBIT or CREDIT
-            transaction_date=transaction.date.isoformat()
-        )
-        logger.debug(f"Queued streak update for txn {transaction.id}, "
-                    f"user {transaction.user_id}, transactor {transaction.transactor_id}")
+        update_recurring_streaks_batch.delay(user_id, items)
+        logger.debug(f"Queued batched streak update for {len(items)} transactions of user {user_id}")
     except Exception as e:
-        logger.error(f"Failed to queue streak update for transaction {transaction.id}: {e}")
+        logger.error(f"Failed to queue streak updates for {len(items)} transactions of user {user_id}: {e}")
         # Don't raise - streak update failure should not block transaction creation
-        # Retry will happen on next schedule
@@ -26,5 +26,12 @@ do
 done
 echo "API ready!"
 
-echo "Starting Celery worker..."
-exec celery -A app.celery.celery_app worker --loglevel=info --concurrency=4 -Q spending_analysis,email_processing,scheduling,celery
+# Tasks drive asyncio through one event loop per worker process
+# (run_async in celery_tasks), so the pool must stay prefork: gevent/thread
+# pools would run several tasks on that loop at once. Tasks are I/O-bound,
+# so scale with processes and let -O fair hand new tasks to idle children
+# instead of queueing them behind a long email sync.
+CELERY_WORKER_CONCURRENCY="${CELERY_WORKER_CONCURRENCY:-4}"
+
+echo "Starting Celery worker (concurrency=${CELERY_WORKER_CONCURRENCY})..."
+exec celery -A app.celery.celery_app worker --loglevel=info --pool=prefork --concurrency="${CELERY_WORKER_CONCURRENCY}" -O fair -Q spending_analysis,email_processing,scheduling,celery
@@ -0,0 +1,116 @@
+"""
+Shared fixtures: an in-memory SQLite database standing in for Postgres.
+
+Only the tables the ingestion pipelines write are created. A few shims make
+SQLite accept what the code sends Postgres: JSONB columns, UUID columns
+bound from strings (asyncpg accepts both) and INSERT ... ON CONFLICT built
+with the Postgres dialect.
+"""
+import asyncio
+import os
+import uuid
+
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.sql import sqltypes
+
+from app.db import Base
+from app.models import User
+import app.models.email_transaction_sync_job  # noqa: F401 (registers the table)
+import app.models.sms_transaction_sync_job  # noqa: F401 (registers the table)
+from app.services.currency_service import invalidate_currency_cache
+
+TABLES = [
+    "users",
+    "currencies",
+    "categories",
+    "transactors",
+    "accounts",
+    "transactions",
+    "email_transaction_sync_jobs",
+    "sms_transaction_sync_jobs",
+]
+
+
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+_uuid_bind_processor = sqltypes.Uuid.bind_processor
+
+
+def _lenient_uuid_bind_processor(self, dialect):
+    process = _uuid_bind_processor(self, dialect)
+    if process is None:
+        return None
+
+    def bind(value):
+        if isinstance(value, str) and self.as_uuid:
+            value = uuid.UUID(value)
+        return process(value)
+    return bind
+
+
+sqltypes.Uuid.bind_processor = _lenient_uuid_bind_processor
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine on an event loop shared by the test and its fixtures."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture
+def session_factory(run, monkeypatch):
+    """Session factory bound to a fresh in-memory database."""
+    import app.celery.email_processing_helper as email_helper
+    import app.celery.transaction_batch_helper as batch_helper
+
+    monkeypatch.setattr(batch_helper, "pg_insert", sqlite_insert)
+    monkeypatch.setattr(email_helper, "pg_insert", sqlite_insert)
+    invalidate_currency_cache()
+
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    # pysqlite's own transaction handling breaks SAVEPOINTs; emit BEGIN ourselves
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    async def create_tables():
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                Base.metadata.create_all,
+                tables=[Base.metadata.tables[name] for name in TABLES],
+            )
+
+    run(create_tables())
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    run(engine.dispose())
+    invalidate_currency_cache()
+
+
+@pytest.fixture
+def user_id(run, session_factory):
+    async def create_user():
+        async with session_factory() as session:
+            user = User(email="user@example.com", google_id="google-user")
+            session.add(user)
+            await session.commit()
+            return user.id
+
+    return run(create_user())
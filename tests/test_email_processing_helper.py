@@ -0,0 +1,172 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+
+import app.celery.email_processing_helper as email_helper
+import app.celery.transaction_batch_helper as batch_helper
+from agent.coordinator import EmailProcessingResult
+from agent.transaction_extractor import Transaction, TransactionType
+from app.celery.email_processing_helper import fetch_user_emails_async, process_email_batch
+from app.models import Transaction as DBTransaction, User
+from app.models.email_transaction_sync_job import EmailTransactionSyncJob, JobStatus
+
+
+class FakeCoordinator:
+    """Parses an email body of the form "<outcome>:<transactor>"."""
+
+    def process_email(self, message_id, subject, body, sender_email=None):
+        outcome, _, transactor = body.partition(":")
+        if outcome == "skip":
+            return EmailProcessingResult(transaction=None, processed=False, skip_reason="not a transaction")
+        if outcome == "empty":
+            return EmailProcessingResult(transaction=None, processed=True)
+        if outcome == "error":
+            raise ValueError(f"could not parse {message_id}")
+        date = "2025-13-01 00:00:00" if outcome == "baddate" else "2025-01-02 10:00:00"
+        return EmailProcessingResult(
+            transaction=Transaction(
+                amount=499.0,
+                transaction_type=TransactionType.EXPENDITURE,
+                date=date,
+                category="Shopping",
+                transactor=transactor or "Amazon",
+            ),
+            processed=True,
+        )
+
+
+def email(message_id: str, body: str):
+    return (message_id, f"Subject {message_id}", body, datetime(2025, 1, 2, tzinfo=timezone.utc), "alerts@bank.com")
+
+
+@pytest.fixture
+def queued_streak_updates(monkeypatch):
+    queued = []
+
+    async def queue_streak_updates(user_id, items):
+        queued.extend(items)
+
+    monkeypatch.setattr(email_helper, "queue_streak_updates", queue_streak_updates)
+    return queued
+
+
+async def create_job(session, user_id) -> EmailTransactionSyncJob:
+    job = EmailTransactionSyncJob(user_id=user_id, status=JobStatus.PROCESSING)
+    session.add(job)
+    await session.commit()
+    return job
+
+
+def test_batch_counters_add_up(run, session_factory, user_id, queued_streak_updates):
+    async def scenario():
+        async with session_factory() as session:
+            job = await create_job(session, user_id)
+            # Imported by an earlier sync
+            await process_email_batch(session, [email("m0", "ok:Amazon")], FakeCoordinator(), user_id, job)
+
+            committed = await process_email_batch(session, [
+                email("m0", "ok:Amazon"),
+                email("m1", "ok:Amazon"),
+                email("m2", "ok:Flipkart"),
+                email("m1", "ok:Amazon"),
+                email("m3", "skip"),
+                email("m4", "empty"),
+                email("m5", "error"),
+                email("m6", "baddate"),
+            ], FakeCoordinator(), user_id, job)
+            assert committed is True
+
+        async with session_factory() as session:
+            job = await session.get(EmailTransactionSyncJob, job.id)
+            assert job.processed_emails == 9
+            assert job.parsed_transactions == 3
+            assert job.skipped_emails == 3
+            assert job.failed_emails == 3
+            assert job.processed_emails == job.parsed_transactions + job.skipped_emails + job.failed_emails
+            # Only exceptions are logged; an empty extraction just counts as failed
+            assert [entry["message_id"] for entry in job.error_log] == ["m5", "m6"]
+
+            message_ids = (await session.execute(select(DBTransaction.message_id))).scalars().all()
+            assert sorted(message_ids) == ["m0", "m1", "m2"]
+            assert len(queued_streak_updates) == 3
+
+    run(scenario())
+
+
+def test_error_log_keeps_latest_entries(run, session_factory, user_id, queued_streak_updates, monkeypatch):
+    monkeypatch.setattr(batch_helper, "MAX_ERROR_LOG_ENTRIES", 2)
+
+    async def scenario():
+        async with session_factory() as session:
+            job = await create_job(session, user_id)
+            emails = [email(f"m{i}", "error") for i in range(3)]
+            await process_email_batch(session, emails, FakeCoordinator(), user_id, job)
+
+            assert job.failed_emails == 3
+            assert [entry["message_id"] for entry in job.error_log] == ["m1", "m2"]
+
+    run(scenario())
+
+
+class FakeGmailService:
+    """Serves two batches of emails, then fails like an expired Gmail token."""
+
+    batches = [
+        [email("m1", "ok:Amazon"), email("m2", "ok:Flipkart")],
+        [email("m3", "skip"), email("m4", "skip")],
+    ]
+
+    def __init__(self, credentials_data=None, token_data=None):
+        self.served = 0
+
+    def get_latest_history_id(self):
+        return "history-1"
+
+    def list_bank_message_ids(self, since_date, query, ascending, max_results):
+        return ["m1", "m2", "m3", "m4", "m5", "m6"]
+
+    def get_email_contents(self, message_ids):
+        if self.served == len(self.batches):
+            raise RuntimeError("Gmail token expired")
+        self.served += 1
+        return self.batches[self.served - 1]
+
+
+def test_failed_sync_keeps_last_committed_progress(run, session_factory, user_id, queued_streak_updates, monkeypatch):
+    monkeypatch.setattr(email_helper, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(email_helper, "GmailService", FakeGmailService)
+    monkeypatch.setattr(email_helper, "EmailProcessingCoordinator", FakeCoordinator)
+    monkeypatch.setattr(email_helper, "BATCH_SIZE", 2)
+
+    async def give_user_credentials():
+        async with session_factory() as session:
+            user = await session.get(User, user_id)
+            user.google_credentials_json = "{}"
+            await session.commit()
+
+    run(give_user_credentials())
+
+    with pytest.raises(RuntimeError, match="Gmail token expired"):
+        run(fetch_user_emails_async(user_id, is_initial=True))
+
+    async def check():
+        async with session_factory() as session:
+            job = (await session.execute(select(EmailTransactionSyncJob))).scalar_one()
+            assert job.status == JobStatus.FAILED
+            assert job.completed_at is not None
+            assert job.total_emails == 6
+            # The second batch only moved progress counters, which were never
+            # committed; the rollback drops them along with anything else unsaved
+            assert job.processed_emails == 2
+            assert job.parsed_transactions == 2
+            assert job.skipped_emails == 0
+            assert [entry["error_type"] for entry in job.error_log] == ["RuntimeError"]
+
+            message_ids = (await session.execute(select(DBTransaction.message_id))).scalars().all()
+            assert sorted(message_ids) == ["m1", "m2"]
+
+            user = await session.get(User, user_id)
+            assert user.last_history_id is None
+
+    run(check())
@@ -0,0 +1,169 @@
+import asyncio
+
+import pytest
+import redis
+
+import app.celery.celery_tasks as celery_tasks
+import app.services.pattern_cache as pattern_cache
+import app.services.pattern_service as pattern_service
+from app.celery.celery_tasks import update_recurring_streaks_batch
+from app.services.pattern_cache import get_cached_no_pattern
+from app.services.pattern_service import PatternService
+
+USER_ID = "11111111-1111-4111-8111-111111111111"
+
+
+class FakeRedis:
+    """The hash commands the cache uses, kept in a dict shared by every "worker"."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({field: str(value) for field, value in mapping.items()})
+
+    def expire(self, key, seconds):
+        pass
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def hset(self, *args, **kwargs):
+        self.commands.append(lambda: self.client.hset(*args, **kwargs))
+
+    def expire(self, *args):
+        self.commands.append(lambda: self.client.expire(*args))
+
+    def execute(self):
+        for command in self.commands:
+            command()
+
+
+class BrokenRedis:
+    def hmget(self, key, fields):
+        raise redis.ConnectionError("Redis is down")
+
+    def pipeline(self):
+        raise redis.ConnectionError("Redis is down")
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def commit(self):
+        pass
+
+
+class FakePatternService:
+    """Matches transactions of transactor "t-gym"; nothing else has a pattern."""
+
+    processed = []
+
+    def __init__(self, db):
+        pass
+
+    async def process_new_transactions(self, transaction_ids):
+        FakePatternService.processed.extend(transaction_ids)
+        return {
+            transaction_id: (
+                {'matched': True} if transaction_id.startswith('gym') else
+                {'matched': False, 'reason': 'No active patterns'}
+            )
+            for transaction_id in transaction_ids
+        }
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(pattern_cache, "_client", client)
+    return client
+
+
+@pytest.fixture
+def fake_pattern_service(monkeypatch):
+    FakePatternService.processed = []
+    monkeypatch.setattr(pattern_service, "PatternService", FakePatternService)
+    monkeypatch.setattr(celery_tasks, "AsyncSessionLocal", FakeSession)
+    return FakePatternService
+
+
+ITEMS = [
+    {'transaction_id': 'gym-1', 'transactor_id': 't-gym', 'direction': 'expense'},
+    {'transaction_id': 'cafe-1', 'transactor_id': 't-cafe', 'direction': 'expense'},
+]
+
+
+def test_batch_skips_transactors_cached_without_pattern(fake_redis, fake_pattern_service):
+    result = update_recurring_streaks_batch(USER_ID, ITEMS)
+    assert result == {'status': 'processed', 'processed': 2, 'matched': 1}
+    assert get_cached_no_pattern(USER_ID, [('t-gym', 'expense'), ('t-cafe', 'expense')]) == [False, True]
+
+    fake_pattern_service.processed.clear()
+    result = update_recurring_streaks_batch(USER_ID, [
+        {'transaction_id': 'gym-2', 'transactor_id': 't-gym', 'direction': 'expense'},
+        {'transaction_id': 'cafe-2', 'transactor_id': 't-cafe', 'direction': 'expense'},
+    ])
+    assert result == {'status': 'processed', 'processed': 1, 'matched': 1}
+    assert fake_pattern_service.processed == ['gym-2']
+
+
+def test_cached_entries_expire(fake_redis, fake_pattern_service, monkeypatch):
+    monkeypatch.setattr(pattern_cache.settings, "PATTERN_NEGATIVE_CACHE_TTL_SECONDS", -1)
+    update_recurring_streaks_batch(USER_ID, ITEMS)
+    assert get_cached_no_pattern(USER_ID, [('t-cafe', 'expense')]) == [False]
+
+
+def test_discovering_patterns_clears_the_shared_cache(fake_redis, fake_pattern_service, monkeypatch):
+    # One worker caches "no pattern" for the cafe...
+    update_recurring_streaks_batch(USER_ID, ITEMS)
+    assert get_cached_no_pattern(USER_ID, [('t-cafe', 'expense')]) == [True]
+
+    # ...then discovery, in another worker or the API, saves a pattern for it
+    service = PatternService(FakeSession())
+
+    async def get_transaction_groups(user_id, transactor_id, direction):
+        return [{'transactor_id': 't-cafe', 'direction': 'expense', 'currency_id': 'inr'}]
+
+    async def load_group_transactions(**group):
+        return ['txn'], None
+
+    async def save_group_candidates(**kwargs):
+        return [{'pattern': 'weekly coffee'}]
+
+    monkeypatch.setattr(service, "_get_transaction_groups", get_transaction_groups)
+    monkeypatch.setattr(service, "_load_group_transactions", load_group_transactions)
+    monkeypatch.setattr(service, "_run_discovery", lambda txns: ['candidate'])
+    monkeypatch.setattr(service, "_save_group_candidates", save_group_candidates)
+    asyncio.run(service.discover_patterns_for_user(USER_ID))
+
+    # The next cafe transaction is matched rather than skipped, in every worker
+    assert get_cached_no_pattern(USER_ID, [('t-cafe', 'expense')]) == [False]
+    fake_pattern_service.processed.clear()
+    update_recurring_streaks_batch(USER_ID, [
+        {'transaction_id': 'cafe-2', 'transactor_id': 't-cafe', 'direction': 'expense'},
+    ])
+    assert fake_pattern_service.processed == ['cafe-2']
+
+
+def test_unreachable_redis_processes_everything(fake_pattern_service, monkeypatch):
+    monkeypatch.setattr(pattern_cache, "_client", BrokenRedis())
+    result = update_recurring_streaks_batch(USER_ID, ITEMS)
+    assert result['processed'] == 2
@@ -0,0 +1,133 @@
+import pytest
+from sqlalchemy import select
+
+import app.celery.sms_processing_helper as sms_helper
+from agent.coordinator import SmsProcessingResult
+from agent.sms_transaction_extractor import SmsTransaction
+from agent.transaction_extractor import TransactionType
+from app.celery.celery_tasks import process_sms_batch_task
+from app.celery.sms_processing_helper import SmsBatchError, process_sms_batch_async
+from app.models import Transaction as DBTransaction
+from app.models.sms_transaction_sync_job import SmsTransactionSyncJob, JobStatus
+
+
+class FakeSmsCoordinator:
+    """Parses every SMS as a 250 INR expense at the sender."""
+
+    def process_sms(self, sms_id, sms_body, sender, timestamp=None):
+        return SmsProcessingResult(
+            transaction=SmsTransaction(
+                amount=250.0,
+                transaction_type=TransactionType.EXPENDITURE,
+                date="2025-01-02 10:00:00",
+                category="Food",
+                description=sms_body,
+                transactor=sender,
+            ),
+            processed=True,
+        )
+
+
+def sms(sms_id: str):
+    return {"sms_id": sms_id, "body": f"Paid for order {sms_id}", "sender": "SWIGGY"}
+
+
+@pytest.fixture
+def sms_env(session_factory, monkeypatch):
+    queued = []
+
+    async def queue_streak_updates(user_id, items):
+        queued.extend(items)
+
+    monkeypatch.setattr(sms_helper, "AsyncSessionLocal", session_factory)
+    monkeypatch.setattr(sms_helper, "SmsProcessingCoordinator", FakeSmsCoordinator)
+    monkeypatch.setattr(sms_helper, "queue_streak_updates", queue_streak_updates)
+    monkeypatch.setattr(sms_helper, "SMS_COMMIT_CHUNK_SIZE", 2)
+    return queued
+
+
+def fail_on_save(monkeypatch, call_number: int):
+    """Make the call_number-th chunk write raise, like a dropped connection."""
+    calls = []
+    save_parsed_transactions = sms_helper.save_parsed_transactions
+
+    async def flaky_save(*args, **kwargs):
+        calls.append(None)
+        if len(calls) == call_number:
+            raise RuntimeError("connection lost")
+        return await save_parsed_transactions(*args, **kwargs)
+
+    monkeypatch.setattr(sms_helper, "save_parsed_transactions", flaky_save)
+
+
+async def load_job(session_factory) -> SmsTransactionSyncJob:
+    async with session_factory() as session:
+        return (await session.execute(select(SmsTransactionSyncJob))).scalar_one()
+
+
+async def stored_message_ids(session_factory) -> list:
+    async with session_factory() as session:
+        return sorted((await session.execute(select(DBTransaction.message_id))).scalars())
+
+
+def test_failed_chunk_keeps_streak_updates_of_committed_chunks(run, session_factory, user_id, sms_env, monkeypatch):
+    fail_on_save(monkeypatch, call_number=2)
+
+    with pytest.raises(SmsBatchError, match="connection lost") as error:
+        run(process_sms_batch_async(user_id, [sms("s1"), sms("s2"), sms("s3"), sms("s4")]))
+    assert error.value.committed_messages == 2
+
+    assert run(stored_message_ids(session_factory)) == ["s1", "s2"]
+    assert len(sms_env) == 2
+
+    job = run(load_job(session_factory))
+    assert job.status == JobStatus.FAILED
+    assert job.parsed_transactions == 2
+
+
+async def create_shared_job(session_factory, user_id, total_sms: int) -> str:
+    async with session_factory() as session:
+        job = SmsTransactionSyncJob(user_id=user_id, status=JobStatus.PENDING, total_sms=total_sms)
+        session.add(job)
+        await session.commit()
+        return str(job.id)
+
+
+def test_retry_resumes_shared_job_after_committed_chunks(run, session_factory, user_id, sms_env, monkeypatch):
+    fail_on_save(monkeypatch, call_number=2)
+    monkeypatch.setattr(process_sms_batch_task, "max_retries", 1)
+    # The upload's other task, still to run, holds the job's last 2 SMS
+    job_id = run(create_shared_job(session_factory, user_id, total_sms=8))
+
+    # The first attempt fails on its second chunk; apply() runs the retry eagerly
+    result = process_sms_batch_task.apply(
+        args=(user_id, [sms("s1"), sms("s2"), sms("s3"), sms("s4"), sms("s5"), sms("s6")], job_id),
+    ).get()
+    assert result["parsed_transactions"] == 6
+
+    job = run(load_job(session_factory))
+    # The retry neither failed the job nor counted the first chunk twice
+    assert job.status == JobStatus.PROCESSING
+    assert job.processed_sms == 6 and job.skipped_sms == 0 and job.failed_sms == 0
+    assert [entry["error"] for entry in job.error_log] == ["connection lost"]
+    assert len(sms_env) == 6
+
+    process_sms_batch_task.apply(args=(user_id, [sms("s7"), sms("s8")], job_id)).get()
+    job = run(load_job(session_factory))
+    assert job.status == JobStatus.COMPLETED
+    assert job.processed_sms == job.total_sms == 8
+    assert run(stored_message_ids(session_factory)) == [f"s{i}" for i in range(1, 9)]
+
+
+def test_final_attempt_fails_shared_job(run, session_factory, user_id, sms_env, monkeypatch):
+    fail_on_save(monkeypatch, call_number=1)
+    job_id = run(create_shared_job(session_factory, user_id, total_sms=2))
+
+    with pytest.raises(SmsBatchError):
+        run(process_sms_batch_async(user_id, [sms("s1"), sms("s2")], job_id, final_attempt=False))
+    assert run(load_job(session_factory)).status == JobStatus.PROCESSING
+
+    fail_on_save(monkeypatch, call_number=1)
+    with pytest.raises(SmsBatchError):
+        run(process_sms_batch_async(user_id, [sms("s1"), sms("s2")], job_id, final_attempt=True))
+    assert run(load_job(session_factory)).status == JobStatus.FAILED
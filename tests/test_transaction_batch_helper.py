@@ -0,0 +1,106 @@
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+import app.celery.transaction_batch_helper as batch_helper
+from agent.transaction_extractor import Transaction, TransactionType
+from app.celery.transaction_batch_helper import parse_transaction_date, save_parsed_transactions
+from app.models import Account, Category, Transaction as DBTransaction, Transactor
+
+
+def make_transaction(**overrides) -> Transaction:
+    fields = dict(
+        amount=250.0,
+        transaction_type=TransactionType.EXPENDITURE,
+        date="2025-01-02 10:00:00",
+        category="Food",
+        description="Order",
+        transactor="Swiggy",
+        account_last_four="1234",
+        bank_name="HDFC",
+    )
+    fields.update(overrides)
+    return Transaction(**fields)
+
+
+def parsed_item(message_id: str, **overrides):
+    transaction = make_transaction(**overrides)
+    return (message_id, transaction, parse_transaction_date(transaction.date), "Unknown")
+
+
+async def count(session, model) -> int:
+    return (await session.execute(select(func.count()).select_from(model))).scalar()
+
+
+async def stored_message_ids(session) -> list:
+    return sorted((await session.execute(select(DBTransaction.message_id))).scalars())
+
+
+def test_bulk_insert_writes_batch_in_one_statement(run, session_factory, user_id, monkeypatch):
+    calls = []
+    insert_transactions = batch_helper.insert_transactions
+
+    async def counting_insert(session, rows):
+        calls.append(len(rows))
+        return await insert_transactions(session, rows)
+
+    monkeypatch.setattr(batch_helper, "insert_transactions", counting_insert)
+
+    async def scenario():
+        async with session_factory() as session:
+            saved = await save_parsed_transactions(
+                session,
+                [parsed_item("m1"), parsed_item("m2"), parsed_item("m3", transactor="Zomato")],
+                user_id,
+            )
+            await session.commit()
+
+            assert calls == [3]
+            assert [error for _, error in saved] == [None, None, None]
+            assert all(row is not None for row, _ in saved)
+            assert await stored_message_ids(session) == ["m1", "m2", "m3"]
+            # Entities shared by the batch are created once
+            assert await count(session, Category) == 1
+            assert await count(session, Transactor) == 2
+            assert await count(session, Account) == 1
+
+    run(scenario())
+
+
+def test_existing_message_ids_are_skipped(run, session_factory, user_id):
+    async def scenario():
+        async with session_factory() as session:
+            await save_parsed_transactions(session, [parsed_item("m1")], user_id)
+            await session.commit()
+
+            saved = await save_parsed_transactions(session, [parsed_item("m1"), parsed_item("m2")], user_id)
+            await session.commit()
+
+            (duplicate, duplicate_error), (new, new_error) = saved
+            assert duplicate is None and duplicate_error is None
+            assert new is not None and new_error is None
+            assert await stored_message_ids(session) == ["m1", "m2"]
+
+    run(scenario())
+
+
+def test_failed_bulk_insert_isolates_bad_row(run, session_factory, user_id):
+    async def scenario():
+        async with session_factory() as session:
+            saved = await save_parsed_transactions(
+                session,
+                # amount is NOT NULL: the multi-row INSERT fails as a whole
+                [parsed_item("m1"), parsed_item("m2", amount=None), parsed_item("m3")],
+                user_id,
+            )
+            await session.commit()
+
+            (first, first_error), (bad, bad_error), (last, last_error) = saved
+            assert first is not None and first_error is None
+            assert bad is None and isinstance(bad_error, IntegrityError)
+            assert last is not None and last_error is None
+            assert await stored_message_ids(session) == ["m1", "m3"]
+            # The lookups reloaded after the failure reuse what m1 created
+            assert await count(session, Transactor) == 1
+            assert await count(session, Category) == 1
+
+    run(scenario())